@@ -0,0 +1,152 @@
+# application/backend/gunicorn.conf.py
+"""Gunicorn runtime profiles for the backend.
+
+Pick a profile with GUNICORN_PROFILE:
+
+    sync     - one request per worker process (src.app:app)
+    gthread  - thread pool per worker process (src.app:app)
+    uvicorn  - asyncio event loop per worker process (src.asgi:app)
+
+Worker and thread counts are derived from the CPUs available to the container
+and can be overridden with GUNICORN_WORKERS / GUNICORN_THREADS. Each worker's
+database pool is sized so that all workers together stay within
+DB_MAX_CONNECTIONS.
+
+Run with: gunicorn --config gunicorn.conf.py
+"""
+import os
+import sys
+
+
+def available_cpus():
+    """CPUs this process may use, honouring affinity and cgroup CPU quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # cgroup v2 ("max 100000" or "200000 100000") and v1 quota files
+    quota_files = [
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ]
+    for quota_file, period_file in quota_files:
+        try:
+            with open(quota_file) as f:
+                values = f.read().split()
+            if period_file:
+                with open(period_file) as f:
+                    values.append(f.read().strip())
+        except OSError:
+            continue
+
+        if values[0] not in ("max", "-1"):
+            cpus = min(cpus, max(int(values[0]) // int(values[1]), 1))
+        break
+
+    return cpus
+
+
+def pool_sizes(workers, budget):
+    """Per-worker (pool_size, max_overflow) keeping all workers within budget"""
+    per_worker = max(budget // workers, 1)
+    pool_size = min(10, per_worker)
+    return pool_size, min(10, per_worker - pool_size)
+
+
+CPUS = available_cpus()
+
+# Worker class, application and sizing for each profile
+PROFILES = {
+    "sync": {
+        "worker_class": "sync",
+        "wsgi_app": "src.app:app",
+        "workers": 2 * CPUS + 1,
+        "threads": 1,
+    },
+    "gthread": {
+        "worker_class": "gthread",
+        "wsgi_app": "src.app:app",
+        "workers": CPUS + 1,
+        "threads": 4,
+    },
+    "uvicorn": {
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "wsgi_app": "src.asgi:app",
+        "workers": CPUS,
+        "threads": 1,
+    },
+}
+
+profile_name = os.environ.get("GUNICORN_PROFILE", "sync")
+if profile_name not in PROFILES:
+    sys.exit(
+        f"Unknown GUNICORN_PROFILE {profile_name!r}, expected one of {sorted(PROFILES)}"
+    )
+profile = PROFILES[profile_name]
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = profile["worker_class"]
+wsgi_app = profile["wsgi_app"]
+threads = int(os.environ.get("GUNICORN_THREADS", profile["threads"]))
+
+# Every worker opens its own connection pool. Postgres allows 100 connections
+# by default; the rest of the budget is left for the master's maintenance,
+# psql and pgAdmin. Without a cgroup quota CPUS is the whole host, so the
+# budget also caps the worker count.
+db_max_connections = int(os.environ.get("DB_MAX_CONNECTIONS", "80"))
+workers = min(
+    int(os.environ.get("GUNICORN_WORKERS", profile["workers"])), db_max_connections
+)
+db_pool_size, db_max_overflow = pool_sizes(workers, db_max_connections)
+# Read by src.config when the app is preloaded below
+os.environ.setdefault("DB_POOL_SIZE", str(db_pool_size))
+os.environ.setdefault("DB_MAX_OVERFLOW", str(db_max_overflow))
+
+timeout = 30
+keepalive = 2
+# Recycle workers to bound leaks, staggered so they do not all restart at once
+max_requests = 1000
+max_requests_jitter = 100
+# Load the app in the master so admission control and the instance registry
+# live in shared memory inherited by every worker
+preload_app = True
+
+
+def when_ready(server):
+    """Repeat api_calls partition maintenance from the master, never the workers"""
+    from src.partitions import start_maintenance_timer
+
+    # preload_app already ran it once while building the app
+    start_maintenance_timer(server.app.wsgi().config)
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and background threads"""
+    # Connections opened by the master while preloading must not be shared
+    if "src.app" in sys.modules:
+        from src.app import app
+        from src.models import db
+
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+    from src.logging_setup import start_log_listener
+
+    start_log_listener()
+    server.log.info(
+        "Worker %s started (profile=%s, threads=%s, db_pool=%s+%s)",
+        worker.pid,
+        profile_name,
+        threads,
+        os.environ["DB_POOL_SIZE"],
+        os.environ["DB_MAX_OVERFLOW"],
+    )
+
+
+def child_exit(server, worker):
+    """Release shared state an exited worker held and count the restart"""
+    from src import admission, instances
+
+    admission.worker_exited(worker.pid)
+    instances.worker_exited(worker.pid)
@@ -0,0 +1,351 @@
+# application/backend/src/admission.py
+"""Admission control and load shedding.
+
+Per-client and global token buckets plus an in-flight request limit, kept in an
+anonymous shared memory region so every gunicorn worker forked from a
+``--preload`` master enforces the same limits. Requests over a limit are shed
+before they reach the database: 429 when a client exceeds its own rate, 503
+when the service as a whole is saturated, both with ``Retry-After``.
+"""
+import hashlib
+import ipaddress
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from flask import g, jsonify, request
+
+# Global bucket tokens, global bucket last refill, PID holding the lock
+HEADER = struct.Struct("ddq")
+# Worker PID (0 = free), requests that worker has in flight
+WORKER = struct.Struct("qq")
+# Client key hash, client bucket tokens, client bucket last refill
+SLOT = struct.Struct("Qdd")
+# Slots inspected for a client key before evicting the stalest one
+PROBE_LIMIT = 8
+# The lock is held for microseconds; waiting longer means its holder died
+LOCK_TIMEOUT = 0.1
+
+logger = logging.getLogger(__name__)
+_controllers = weakref.WeakSet()
+
+
+class AdmissionController:
+    """Token buckets and a concurrency limit shared by every forked worker
+
+    Each worker counts its own in-flight requests in a slot keyed by PID, so
+    a worker killed mid-request (e.g. by the gunicorn timeout) only takes its
+    own count with it: worker_exited() clears the slot, and dead PIDs' slots
+    are reclaimed. If the shared lock cannot be taken in LOCK_TIMEOUT the
+    request is admitted without checking the buckets rather than hanging.
+    """
+
+    def __init__(
+        self,
+        client_rate,
+        client_burst,
+        global_rate,
+        global_burst,
+        max_in_flight,
+        client_slots=4096,
+        worker_slots=256,
+    ):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_in_flight = max_in_flight
+        self.client_slots = client_slots
+        self.worker_slots = worker_slots
+        self._clients_offset = HEADER.size + worker_slots * WORKER.size
+
+        # Anonymous mappings and semaphores are inherited across fork()
+        self._memory = mmap.mmap(-1, self._clients_offset + client_slots * SLOT.size)
+        self._lock = multiprocessing.Lock()
+        HEADER.pack_into(self._memory, 0, float(global_burst), time.monotonic(), 0)
+
+        # Only this process's threads write its worker slot
+        self._local_lock = threading.Lock()
+        self._worker_pid = None
+        self._worker_offset = None
+        _controllers.add(self)
+
+    def admit(self, client):
+        """Admit a request, or return (status, retry_after, reason) to shed it"""
+        if not self._acquire():
+            logger.warning("Admission lock unavailable, admitting without limits")
+            with self._local_lock:
+                self._add_in_flight(1)
+            return None
+
+        try:
+            return self._admit_locked(client)
+        finally:
+            self._release_lock()
+
+    def release(self):
+        """Return the in-flight slot taken by an admitted request"""
+        with self._local_lock:
+            self._add_in_flight(-1)
+
+    def in_flight(self):
+        """Number of admitted requests that have not finished yet, in all workers"""
+        return sum(
+            WORKER.unpack_from(self._memory, offset)[1]
+            for offset in self._worker_offsets()
+        )
+
+    def worker_exited(self, pid):
+        """Drop an exited worker's in-flight count and free a lock it died holding"""
+        for offset in self._worker_offsets():
+            if WORKER.unpack_from(self._memory, offset)[0] == pid:
+                WORKER.pack_into(self._memory, offset, 0, 0)
+
+        # Any process may release a multiprocessing.Lock; only the master does
+        # so here, and only for a holder that is known to be dead
+        if HEADER.unpack_from(self._memory, 0)[2] == pid:
+            self._release_lock()
+            logger.warning("Released admission lock held by exited worker %s", pid)
+
+    def _admit_locked(self, client):
+        now = time.monotonic()
+        key = client_key(client)
+
+        global_tokens, global_last, holder = HEADER.unpack_from(self._memory, 0)
+        global_tokens = refill(
+            global_tokens, global_last, now, self.global_rate, self.global_burst
+        )
+
+        offset = self._client_slot(key)
+        slot_key, client_tokens, client_last = SLOT.unpack_from(self._memory, offset)
+        if slot_key != key:
+            client_tokens, client_last = float(self.client_burst), now
+        client_tokens = refill(
+            client_tokens, client_last, now, self.client_rate, self.client_burst
+        )
+
+        # Check every limit before consuming so a shed request costs nothing
+        rejection = None
+        if client_tokens < 1:
+            retry_after = (1 - client_tokens) / self.client_rate
+            rejection = (429, retry_after, "Client rate limit exceeded")
+        elif global_tokens < 1:
+            retry_after = (1 - global_tokens) / self.global_rate
+            rejection = (503, retry_after, "Service over capacity")
+        elif self.in_flight() >= self.max_in_flight:
+            rejection = (503, 1, "Too many requests in flight")
+        else:
+            client_tokens -= 1
+            global_tokens -= 1
+            with self._local_lock:
+                self._add_in_flight(1, claim=True)
+
+        HEADER.pack_into(self._memory, 0, global_tokens, now, holder)
+        SLOT.pack_into(self._memory, offset, key, client_tokens, now)
+        return rejection
+
+    def _acquire(self):
+        if not self._lock.acquire(timeout=LOCK_TIMEOUT):
+            return False
+        tokens, last, _ = HEADER.unpack_from(self._memory, 0)
+        HEADER.pack_into(self._memory, 0, tokens, last, os.getpid())
+        return True
+
+    def _release_lock(self):
+        tokens, last, _ = HEADER.unpack_from(self._memory, 0)
+        HEADER.pack_into(self._memory, 0, tokens, last, 0)
+        self._lock.release()
+
+    def _add_in_flight(self, delta, claim=False):
+        """Adjust this worker's count; caller holds the local lock"""
+        offset = self._own_worker_slot(claim)
+        if offset is None:
+            return
+        pid, count = WORKER.unpack_from(self._memory, offset)
+        WORKER.pack_into(self._memory, offset, pid, max(count + delta, 0))
+
+    def _own_worker_slot(self, claim=False):
+        """This process's worker slot, claimed under the shared lock after fork"""
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return self._worker_offset
+        if not claim:
+            return None
+
+        # A free slot, or one left behind by a worker that no longer exists
+        for offset in self._worker_offsets():
+            slot_pid = WORKER.unpack_from(self._memory, offset)[0]
+            if slot_pid in (0, pid) or not pid_alive(slot_pid):
+                WORKER.pack_into(self._memory, offset, pid, 0)
+                self._worker_pid, self._worker_offset = pid, offset
+                return offset
+        return None
+
+    def _worker_offsets(self):
+        return range(HEADER.size, self._clients_offset, WORKER.size)
+
+    def _client_slot(self, key):
+        """Find the slot holding key, else an empty or the stalest slot"""
+        start = key % self.client_slots
+        victim, victim_last = None, None
+        for probe in range(PROBE_LIMIT):
+            offset = (
+                self._clients_offset + ((start + probe) % self.client_slots) * SLOT.size
+            )
+            slot_key, _, slot_last = SLOT.unpack_from(self._memory, offset)
+            if slot_key == key or slot_key == 0:
+                return offset
+            if victim is None or slot_last < victim_last:
+                victim, victim_last = offset, slot_last
+        return victim
+
+
+def pid_alive(pid):
+    """Whether a process with this PID still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_exited(pid):
+    """Clean up after a worker; called from gunicorn's child_exit hook"""
+    for controller in list(_controllers):
+        controller.worker_exited(pid)
+
+
+def client_key(client):
+    """Hash a client identifier to a stable non-zero 64-bit slot key"""
+    digest = hashlib.blake2b(client.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") or 1
+
+
+def refill(tokens, last, now, rate, burst):
+    """Add the tokens earned since last, capped at the bucket size"""
+    return min(float(burst), tokens + max(now - last, 0) * rate)
+
+
+def trusted_networks(proxies):
+    """Parse trusted proxy addresses and CIDRs"""
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def client_address(remote_addr, real_ip, trusted):
+    """Identify the client, taking X-Real-IP only from a trusted proxy"""
+    if real_ip and remote_addr:
+        try:
+            peer = ipaddress.ip_address(remote_addr)
+        except ValueError:
+            peer = None
+        if peer is not None and any(peer in network for network in trusted):
+            return real_ip
+    return remote_addr or "unknown"
+
+
+def controller_from_config(config):
+    """Controller sized by the ADMISSION_* settings"""
+    return AdmissionController(
+        client_rate=config.get("ADMISSION_CLIENT_RATE", 20),
+        client_burst=config.get("ADMISSION_CLIENT_BURST", 40),
+        global_rate=config.get("ADMISSION_GLOBAL_RATE", 200),
+        global_burst=config.get("ADMISSION_GLOBAL_BURST", 400),
+        max_in_flight=config.get("ADMISSION_MAX_IN_FLIGHT", 32),
+        client_slots=config.get("ADMISSION_CLIENT_SLOTS", 4096),
+    )
+
+
+def rejection_body(status, reason):
+    """JSON body of a shed request, in the shape of the app's error responses"""
+    return {
+        "error": reason,
+        "status": status,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def init_admission_control(app):
+    """Shed excess load before it reaches the database"""
+    controller = controller_from_config(app.config)
+    # The load balancer health check is never shed or counted
+    exempt_paths = set(app.config.get("ADMISSION_EXEMPT_PATHS", ("/health",)))
+    trusted = trusted_networks(app.config.get("ADMISSION_TRUSTED_PROXIES", ()))
+    app.extensions["admission"] = controller
+
+    @app.before_request
+    def admit_request():
+        """Reject the request early if any limit is exhausted"""
+        if request.path in exempt_paths:
+            return None
+
+        client = client_address(
+            request.remote_addr, request.headers.get("X-Real-IP"), trusted
+        )
+        rejection = controller.admit(client)
+        if rejection is None:
+            g.admitted = True
+            return None
+
+        status, retry_after, reason = rejection
+        response = jsonify(rejection_body(status, reason))
+        response.status_code = status
+        response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+        return response
+
+    @app.teardown_request
+    def release_request(error=None):
+        """Free the in-flight slot, even if the handler raised"""
+        if g.pop("admitted", False):
+            controller.release()
+
+    return controller
+
+
+def init_asgi_admission_control(app):
+    """Same limits for src.asgi, sharing the counters of every worker"""
+    # Only the async serving mode needs Quart
+    from quart import g, jsonify, request
+
+    controller = controller_from_config(app.config)
+    exempt_paths = set(app.config.get("ADMISSION_EXEMPT_PATHS", ("/health",)))
+    trusted = trusted_networks(app.config.get("ADMISSION_TRUSTED_PROXIES", ()))
+    app.extensions["admission"] = controller
+
+    @app.before_request
+    async def admit_request():
+        """Reject the request early if any limit is exhausted"""
+        if request.path in exempt_paths:
+            return None
+
+        # admit() holds the shared lock for microseconds, and at most
+        # LOCK_TIMEOUT, so it runs on the event loop rather than a thread
+        client = client_address(
+            request.remote_addr, request.headers.get("X-Real-IP"), trusted
+        )
+        rejection = controller.admit(client)
+        if rejection is None:
+            g.admitted = True
+            return None
+
+        status, retry_after, reason = rejection
+        response = jsonify(rejection_body(status, reason))
+        response.status_code = status
+        response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+        return response
+
+    @app.teardown_request
+    async def release_request(error=None):
+        """Free the in-flight slot, even if the handler raised"""
+        if g.pop("admitted", False):
+            controller.release()
+
+    return controller
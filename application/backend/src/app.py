@@ -1,4 +1,5 @@
 # application/backend/src/app.py
+import json
 import logging
 import os
 from datetime import datetime
@@ -7,8 +8,27 @@ import psycopg2
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from src.admission import init_admission_control
+from src.compression import collection_etag, init_compression, json_envelope
 from src.config import Config
-from src.models import APICall, User, db
+from src.instances import format_uptime, init_instance_registry
+from src.logging_setup import (
+    configure_logging,
+    dropped_log_records,
+    init_request_logging,
+)
+from src.models import APICall, CollectionVersion, User, UserTombstone, db
+from src.pagination import (
+    changes_page,
+    decode_watermark,
+    keyset_after,
+    settled_cutoff,
+)
+from src.partitions import (
+    maintain_api_call_partitions,
+    maintenance_options,
+    retention_start,
+)
 
 
 def create_app(config_class=Config):
@@ -16,21 +36,50 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Configure logging
+    configure_logging(
+        app.config.get("LOG_LEVEL", "INFO"),
+        app.config.get("LOG_QUEUE_SIZE", 10000),
+        app.config.get("LOG_SAMPLING"),
+    )
+    init_request_logging(app)
+    logger = logging.getLogger(__name__)
+
     # Initialize extensions
     db.init_app(app)
     CORS(app, origins=os.getenv("ALLOWED_ORIGINS", "*").split(","))
-
-    # Configure logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+    if app.config.get("ADMISSION_CONTROL_ENABLED", False):
+        init_admission_control(app)
+    compressor = init_compression(app)
+    registry = init_instance_registry(
+        app.config.get("INSTANCE_REGISTRY_SLOTS", 64),
+        app.config.get("VERSION", "1.0.0"),
+    )
+
+    def maintain_partitions(conn):
+        """Keep api_calls partitions in line with the configured retention"""
+        maintain_api_call_partitions(conn, **maintenance_options(app.config))
 
     # Create tables within app context
-    with app.app_context():
-        try:
-            db.create_all()
-            logger.info("Database tables created successfully")
-        except Exception as e:
-            logger.error(f"Error creating database tables: {str(e)}")
+    if app.config.get("AUTO_CREATE_SCHEMA", True):
+        with app.app_context():
+            try:
+                db.create_all()
+                logger.info("Database tables created successfully")
+            except Exception as e:
+                logger.error("Error creating database tables: %s", e)
+
+            try:
+                with db.engine.begin() as conn:
+                    maintain_partitions(conn)
+            except Exception as e:
+                logger.error("Error maintaining api_calls partitions: %s", e)
+
+    @app.cli.command("maintain-partitions")
+    def maintain_partitions_command():
+        """Create upcoming api_calls partitions and expire old ones (for cron)"""
+        with db.engine.begin() as conn:
+            maintain_partitions(conn)
 
     @app.route("/health", methods=["GET"])
     def health_check():
@@ -40,7 +89,7 @@ def create_app(config_class=Config):
             db.session.execute(db.text("SELECT 1"))
             db_status = "healthy"
         except Exception as e:
-            logger.error(f"Database health check failed: {str(e)}")
+            logger.error("Database health check failed: %s", e)
             db_status = "unhealthy"
 
         # Log API call
@@ -86,29 +135,87 @@ def create_app(config_class=Config):
             return jsonify(data), 200
 
         except Exception as e:
-            logger.error(f"Error in get_data: {str(e)}")
+            logger.error("Error in get_data: %s", e)
             return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
     @app.route("/api/users", methods=["GET"])
     def get_users():
         """Get all users"""
         try:
-            users = User.query.all()
+            # Unchanged users are served from the cache without serializing;
+            # only the envelope with the timestamp is built per request
+            version = db.session.scalar(CollectionVersion.current("users"))
+            etag = collection_etag("users", version)
+
+            cached = compressor.cached_body(etag)
+            if cached is None:
+                users = User.query.all()
+                serialized = json.dumps(
+                    [user.to_dict() for user in users],
+                    separators=(",", ":"),
+                    default=str,
+                ).encode()
+                cached = compressor.store_body(etag, (len(users), serialized))
+            count, serialized = cached
+
             log_api_call("/api/users", "GET")
 
-            return (
-                jsonify(
-                    {
-                        "users": [user.to_dict() for user in users],
-                        "count": len(users),
-                        "timestamp": datetime.utcnow().isoformat(),
-                    }
-                ),
-                200,
+            body = json_envelope(
+                {"count": count, "timestamp": datetime.utcnow().isoformat()},
+                users=serialized,
             )
+            response = app.response_class(body, mimetype="application/json")
+            if etag:
+                # Weak: the timestamp differs between otherwise equal bodies
+                response.set_etag(etag, weak=True)
+                return response.make_conditional(request)
+            return response, 200
 
         except Exception as e:
-            logger.error(f"Error in get_users: {str(e)}")
+            logger.error("Error in get_users: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/users/changes", methods=["GET"])
+    def get_user_changes():
+        """Get users created, updated or deleted after a watermark"""
+        try:
+            since = request.args.get("since")
+            limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+
+            try:
+                watermark = decode_watermark(since) if since else None
+            except ValueError:
+                return jsonify({"error": "Invalid since watermark"}), 400
+
+            # Hold back changes that may still have uncommitted neighbours
+            cutoff = settled_cutoff(app.config.get("USER_SYNC_SAFETY_LAG_SECONDS", 30))
+
+            # Fetch one extra row per stream to know whether more remain
+            users = User.query.filter(User.updated_at <= cutoff)
+            tombstones = UserTombstone.query.filter(UserTombstone.deleted_at <= cutoff)
+            if watermark:
+                users = users.filter(keyset_after(User.updated_at, User.id, watermark))
+                tombstones = tombstones.filter(
+                    keyset_after(
+                        UserTombstone.deleted_at, UserTombstone.user_id, watermark
+                    )
+                )
+            users = users.order_by(User.updated_at, User.id).limit(limit + 1).all()
+            tombstones = (
+                tombstones.order_by(UserTombstone.deleted_at, UserTombstone.user_id)
+                .limit(limit + 1)
+                .all()
+            )
+
+            page = changes_page(users, tombstones, limit, since)
+            page["timestamp"] = datetime.utcnow().isoformat()
+
+            log_api_call("/api/users/changes", "GET")
+
+            return jsonify(page), 200
+
+        except Exception as e:
+            logger.error("Error in get_user_changes: %s", e)
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/users", methods=["POST"])
@@ -132,7 +239,7 @@ def create_app(config_class=Config):
             db.session.commit()
 
             log_api_call("/api/users", "POST")
-            logger.info(f"Created new user: {user.email}")
+            logger.info("Created new user: %s", user.email)
 
             return (
                 jsonify(
@@ -143,7 +250,7 @@ def create_app(config_class=Config):
 
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error in create_user: {str(e)}")
+            logger.error("Error in create_user: %s", e)
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/stats", methods=["GET"])
@@ -155,16 +262,18 @@ def create_app(config_class=Config):
                 "total_api_calls": get_total_api_calls(),
                 "health_checks": get_api_calls_count("/health"),
                 "data_requests": get_api_calls_count("/api/data"),
-                "uptime": get_uptime(),
                 "timestamp": datetime.utcnow().isoformat(),
             }
+            stats.update(get_uptime())
+            stats["compression"] = compressor.stats()
+            stats["logging"] = {"dropped_records": dropped_log_records()}
 
             log_api_call("/api/stats", "GET")
 
             return jsonify(stats), 200
 
         except Exception as e:
-            logger.error(f"Error in get_stats: {str(e)}")
+            logger.error("Error in get_stats: %s", e)
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/test-db", methods=["GET"])
@@ -196,7 +305,7 @@ def create_app(config_class=Config):
             )
 
         except Exception as e:
-            logger.error(f"Database test failed: {str(e)}")
+            logger.error("Database test failed: %s", e)
             return jsonify({"database_status": "error", "error": str(e)}), 503
 
     def log_api_call(endpoint, method):
@@ -212,36 +321,33 @@ def create_app(config_class=Config):
             db.session.add(api_call)
             db.session.commit()
         except Exception as e:
-            logger.error(f"Error logging API call: {str(e)}")
+            logger.error("Error logging API call: %s", e)
             db.session.rollback()
 
+    def recent_api_calls():
+        """API calls inside the retention window, so Postgres prunes partitions"""
+        window_start = retention_start(app.config.get("API_CALLS_RETENTION_MONTHS", 3))
+        return APICall.query.filter(APICall.timestamp >= window_start)
+
     def get_total_api_calls():
         """Get total number of API calls"""
         try:
-            return APICall.query.count()
+            return recent_api_calls().count()
         except:
             return 0
 
     def get_api_calls_count(endpoint):
         """Get API calls count for specific endpoint"""
         try:
-            return APICall.query.filter_by(endpoint=endpoint).count()
+            return recent_api_calls().filter_by(endpoint=endpoint).count()
         except:
             return 0
 
     def get_uptime():
-        """Calculate application uptime"""
-        try:
-            # Get the earliest API call as a proxy for start time
-            first_call = APICall.query.order_by(APICall.timestamp.asc()).first()
-            if first_call:
-                uptime_seconds = (
-                    datetime.utcnow() - first_call.timestamp
-                ).total_seconds()
-                return f"{int(uptime_seconds // 3600)}h {int((uptime_seconds % 3600) // 60)}m"
-            return "Unknown"
-        except:
-            return "Unknown"
+        """Calculate instance and fleet uptime from the in-memory registry"""
+        uptime = registry.snapshot(version=app.config.get("VERSION", "1.0.0"))
+        uptime["uptime"] = format_uptime(uptime["fleet"]["uptime_seconds"])
+        return uptime
 
     @app.errorhandler(404)
     def not_found(error):
@@ -260,7 +366,7 @@ def create_app(config_class=Config):
     @app.errorhandler(500)
     def internal_error(error):
         """Handle 500 errors"""
-        logger.error(f"Internal server error: {str(error)}")
+        logger.error("Internal server error: %s", error)
         db.session.rollback()
         return (
             jsonify(
@@ -284,8 +390,8 @@ if __name__ == "__main__":
     debug = os.environ.get("FLASK_ENV") == "development"
 
     logger = logging.getLogger(__name__)
-    logger.info(f"Starting Flask app on port {port}")
-    logger.info(f"Environment: {app.config.get('ENVIRONMENT', 'unknown')}")
-    logger.info(f"Debug mode: {debug}")
+    logger.info("Starting Flask app on port %s", port)
+    logger.info("Environment: %s", app.config.get("ENVIRONMENT", "unknown"))
+    logger.info("Debug mode: %s", debug)
 
     app.run(host="0.0.0.0", port=port, debug=debug)
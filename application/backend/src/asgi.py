@@ -0,0 +1,484 @@
+# application/backend/src/asgi.py
+"""Asynchronous serving mode.
+
+ASGI counterpart of src.app with the same routes and response shapes, backed by
+SQLAlchemy's asyncio extension (asyncpg in production) so a single worker can
+keep many requests in flight while they wait on Postgres.
+
+Run with: gunicorn -k uvicorn.workers.UvicornWorker src.asgi:app
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+from quart import Quart, jsonify, request
+from quart_cors import cors
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.admission import init_asgi_admission_control
+from src.compression import (
+    ResponseCompressor,
+    collection_etag,
+    encoded_etag,
+    json_envelope,
+)
+from src.config import Config
+from src.instances import format_uptime, init_instance_registry
+from src.logging_setup import (
+    configure_logging,
+    dropped_log_records,
+    init_asgi_request_logging,
+)
+from src.models import APICall, CollectionVersion, User, UserTombstone, db
+from src.pagination import (
+    changes_page,
+    decode_watermark,
+    keyset_after,
+    settled_cutoff,
+)
+from src.partitions import maintain_database, maintenance_options, retention_start
+
+# Async driver used for each synchronous database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_uri(uri):
+    """Swap the synchronous driver in a database URI for its async equivalent"""
+    url = make_url(uri)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername)
+
+
+def create_asgi_app(config_class=Config):
+    """Application factory pattern for the async serving mode"""
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    app = cors(app, allow_origin=os.getenv("ALLOWED_ORIGINS", "*").split(","))
+
+    configure_logging(
+        app.config.get("LOG_LEVEL", "INFO"),
+        app.config.get("LOG_QUEUE_SIZE", 10000),
+        app.config.get("LOG_SAMPLING"),
+    )
+    init_asgi_request_logging(app)
+    logger = logging.getLogger(__name__)
+    if app.config.get("ADMISSION_CONTROL_ENABLED", False):
+        init_asgi_admission_control(app)
+    registry = init_instance_registry(
+        app.config.get("INSTANCE_REGISTRY_SLOTS", 64),
+        app.config.get("VERSION", "1.0.0"),
+    )
+    compressor = ResponseCompressor(
+        min_size=app.config.get("COMPRESSION_MIN_SIZE", 1024),
+        cache_size=app.config.get("COMPRESSION_CACHE_SIZE", 64),
+    )
+    app.extensions["compression"] = compressor
+
+    # Schema and partition DDL run once where the app is built (the gunicorn
+    # master under preload_app), never in every worker's before_serving
+    if app.config.get("AUTO_CREATE_SCHEMA", True):
+        engine = create_engine(
+            app.config["SQLALCHEMY_DATABASE_URI"], poolclass=NullPool
+        )
+        try:
+            db.metadata.create_all(engine)
+            logger.info("Database tables created successfully")
+        except Exception as e:
+            logger.error("Error creating database tables: %s", e)
+        finally:
+            engine.dispose()
+
+        try:
+            maintain_database(
+                app.config["SQLALCHEMY_DATABASE_URI"], **maintenance_options(app.config)
+            )
+        except Exception as e:
+            logger.error("Error maintaining api_calls partitions: %s", e)
+
+    @app.before_serving
+    async def start_database():
+        """Create the async engine and session pool on the serving event loop"""
+        url = async_database_uri(app.config["SQLALCHEMY_DATABASE_URI"])
+        # SQLite pools take neither pool sizing nor asyncpg connect args
+        options = {}
+        if url.get_backend_name() != "sqlite":
+            options = app.config.get("ASYNC_SQLALCHEMY_ENGINE_OPTIONS", {})
+
+        engine = create_async_engine(url, **options)
+        app.extensions["async_db"] = {
+            "engine": engine,
+            "session": async_sessionmaker(engine, expire_on_commit=False),
+        }
+
+    @app.after_serving
+    async def stop_database():
+        """Close every pooled connection"""
+        await app.extensions["async_db"]["engine"].dispose()
+
+    def session_scope():
+        """Open a session from the async pool"""
+        return app.extensions["async_db"]["session"]()
+
+    @app.route("/health", methods=["GET"])
+    async def health_check():
+        """Health check endpoint for load balancer"""
+        async with session_scope() as session:
+            try:
+                # Check database connection
+                await session.execute(db.text("SELECT 1"))
+                db_status = "healthy"
+            except Exception as e:
+                logger.error("Database health check failed: %s", e)
+                db_status = "unhealthy"
+
+            # Log API call
+            await log_api_call(session, "/health", "GET")
+
+        return (
+            jsonify(
+                {
+                    "status": "healthy",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "environment": app.config.get("ENVIRONMENT", "unknown"),
+                    "version": app.config.get("VERSION", "1.0.0"),
+                    "database": db_status,
+                    "service": "backend-api",
+                }
+            ),
+            200 if db_status == "healthy" else 503,
+        )
+
+    @app.route("/api/data", methods=["GET"])
+    async def get_data():
+        """Get application data"""
+        try:
+            async with session_scope() as session:
+                # Log API call
+                await log_api_call(session, "/api/data", "GET")
+
+                # Sample data response
+                data = {
+                    "message": "API is working perfectly!",
+                    "environment": app.config.get("ENVIRONMENT", "unknown"),
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "total_requests": await get_total_api_calls(session),
+                    "server_info": {
+                        "host": os.getenv("HOSTNAME", "unknown"),
+                        "region": os.getenv("AWS_REGION", "us-east-1"),
+                        "az": os.getenv("AWS_AZ", "unknown"),
+                    },
+                }
+
+            return jsonify(data), 200
+
+        except Exception as e:
+            logger.error("Error in get_data: %s", e)
+            return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+    @app.route("/api/users", methods=["GET"])
+    async def get_users():
+        """Get all users"""
+        try:
+            async with session_scope() as session:
+                # Unchanged users are served from the cache without serializing;
+                # only the envelope with the timestamp is built per request
+                version = await session.scalar(CollectionVersion.current("users"))
+                etag = collection_etag("users", version)
+
+                cached = compressor.cached_body(etag)
+                if cached is None:
+                    users = (await session.scalars(select(User))).all()
+                    serialized = json.dumps(
+                        [user.to_dict() for user in users],
+                        separators=(",", ":"),
+                        default=str,
+                    ).encode()
+                    cached = compressor.store_body(etag, (len(users), serialized))
+                count, serialized = cached
+
+                await log_api_call(session, "/api/users", "GET")
+
+            body = json_envelope(
+                {"count": count, "timestamp": datetime.utcnow().isoformat()},
+                users=serialized,
+            )
+            response = app.response_class(body, mimetype="application/json")
+            if etag:
+                # Weak: the timestamp differs between otherwise equal bodies
+                response.set_etag(etag, weak=True)
+                return await response.make_conditional(request)
+            return response, 200
+
+        except Exception as e:
+            logger.error("Error in get_users: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/users/changes", methods=["GET"])
+    async def get_user_changes():
+        """Get users created, updated or deleted after a watermark"""
+        try:
+            since = request.args.get("since")
+            limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+
+            try:
+                watermark = decode_watermark(since) if since else None
+            except ValueError:
+                return jsonify({"error": "Invalid since watermark"}), 400
+
+            # Hold back changes that may still have uncommitted neighbours
+            cutoff = settled_cutoff(app.config.get("USER_SYNC_SAFETY_LAG_SECONDS", 30))
+
+            # Fetch one extra row per stream to know whether more remain
+            users = (
+                select(User)
+                .where(User.updated_at <= cutoff)
+                .order_by(User.updated_at, User.id)
+            )
+            tombstones = (
+                select(UserTombstone)
+                .where(UserTombstone.deleted_at <= cutoff)
+                .order_by(UserTombstone.deleted_at, UserTombstone.user_id)
+            )
+            if watermark:
+                users = users.where(keyset_after(User.updated_at, User.id, watermark))
+                tombstones = tombstones.where(
+                    keyset_after(
+                        UserTombstone.deleted_at, UserTombstone.user_id, watermark
+                    )
+                )
+
+            async with session_scope() as session:
+                users = (await session.scalars(users.limit(limit + 1))).all()
+                tombstones = (await session.scalars(tombstones.limit(limit + 1))).all()
+
+                page = changes_page(users, tombstones, limit, since)
+                page["timestamp"] = datetime.utcnow().isoformat()
+
+                await log_api_call(session, "/api/users/changes", "GET")
+
+            return jsonify(page), 200
+
+        except Exception as e:
+            logger.error("Error in get_user_changes: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/users", methods=["POST"])
+    async def create_user():
+        """Create a new user"""
+        async with session_scope() as session:
+            try:
+                data = await request.get_json()
+
+                if not data or "name" not in data or "email" not in data:
+                    return jsonify({"error": "Name and email are required"}), 400
+
+                # Check if user already exists
+                existing_user = await session.scalar(
+                    select(User).filter_by(email=data["email"]).limit(1)
+                )
+                if existing_user:
+                    return (
+                        jsonify({"error": "User with this email already exists"}),
+                        409,
+                    )
+
+                # Create new user
+                user = User(name=data["name"], email=data["email"])
+
+                session.add(user)
+                await session.commit()
+
+                await log_api_call(session, "/api/users", "POST")
+                logger.info("Created new user: %s", user.email)
+
+                return (
+                    jsonify(
+                        {"message": "User created successfully", "user": user.to_dict()}
+                    ),
+                    201,
+                )
+
+            except Exception as e:
+                await session.rollback()
+                logger.error("Error in create_user: %s", e)
+                return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/stats", methods=["GET"])
+    async def get_stats():
+        """Get application statistics"""
+        try:
+            async with session_scope() as session:
+                stats = {
+                    "total_users": await session.scalar(
+                        select(func.count()).select_from(User)
+                    ),
+                    "total_api_calls": await get_total_api_calls(session),
+                    "health_checks": await get_api_calls_count(session, "/health"),
+                    "data_requests": await get_api_calls_count(session, "/api/data"),
+                    "timestamp": datetime.utcnow().isoformat(),
+                }
+                stats.update(get_uptime())
+                stats["compression"] = compressor.stats()
+                stats["logging"] = {"dropped_records": dropped_log_records()}
+
+                await log_api_call(session, "/api/stats", "GET")
+
+            return jsonify(stats), 200
+
+        except Exception as e:
+            logger.error("Error in get_stats: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/test-db", methods=["GET"])
+    async def test_database():
+        """Test database connectivity"""
+        try:
+            async with session_scope() as session:
+                # Test raw SQL connection
+                result = await session.execute(
+                    db.text("SELECT NOW() as current_time, version() as pg_version")
+                )
+                row = result.fetchone()
+
+                await log_api_call(session, "/api/test-db", "GET")
+
+            return (
+                jsonify(
+                    {
+                        "database_status": "connected",
+                        "current_time": str(row.current_time),
+                        "postgresql_version": row.pg_version,
+                        "connection_info": {
+                            "host": app.config.get("DB_HOST", "unknown"),
+                            "database": app.config.get("DB_NAME", "unknown"),
+                            "port": app.config.get("DB_PORT", 5432),
+                        },
+                    }
+                ),
+                200,
+            )
+
+        except Exception as e:
+            logger.error("Database test failed: %s", e)
+            return jsonify({"database_status": "error", "error": str(e)}), 503
+
+    async def log_api_call(session, endpoint, method):
+        """Log API call to database"""
+        try:
+            api_call = APICall(
+                endpoint=endpoint,
+                method=method,
+                timestamp=datetime.utcnow(),
+                user_agent=request.headers.get("User-Agent"),
+                ip_address=request.remote_addr,
+            )
+            session.add(api_call)
+            await session.commit()
+        except Exception as e:
+            logger.error("Error logging API call: %s", e)
+            await session.rollback()
+
+    def count_recent_api_calls():
+        """Count API calls inside the retention window, so Postgres prunes partitions"""
+        window_start = retention_start(app.config.get("API_CALLS_RETENTION_MONTHS", 3))
+        return (
+            select(func.count())
+            .select_from(APICall)
+            .where(APICall.timestamp >= window_start)
+        )
+
+    async def get_total_api_calls(session):
+        """Get total number of API calls"""
+        try:
+            return await session.scalar(count_recent_api_calls())
+        except Exception:
+            return 0
+
+    async def get_api_calls_count(session, endpoint):
+        """Get API calls count for specific endpoint"""
+        try:
+            return await session.scalar(
+                count_recent_api_calls().where(APICall.endpoint == endpoint)
+            )
+        except Exception:
+            return 0
+
+    def get_uptime():
+        """Calculate instance and fleet uptime from the in-memory registry"""
+        uptime = registry.snapshot(version=app.config.get("VERSION", "1.0.0"))
+        uptime["uptime"] = format_uptime(uptime["fleet"]["uptime_seconds"])
+        return uptime
+
+    if app.config.get("COMPRESSION_ENABLED", True):
+
+        @app.after_request
+        async def compress_response(response):
+            """Encode the body with the client's preferred encoding"""
+            # Streamed bodies (async generators) are sent as they are
+            if not compressor.eligible(response) or not isinstance(
+                response.response, response.data_body_class
+            ):
+                return response
+
+            response.vary.add("Accept-Encoding")
+            encoding = compressor.negotiate(request.headers.get("Accept-Encoding"))
+            if encoding is None:
+                return response
+
+            body = await response.get_data()
+            if len(body) < compressor.min_size:
+                return response
+            etag, weak = response.get_etag()
+            if etag is not None:
+                response.set_etag(encoded_etag(etag, encoding), weak)
+                await response.make_conditional(request)
+                if response.status_code == 304:
+                    return response
+            # A weak ETag allows the bytes to differ between requests
+            response.set_data(
+                compressor.compress(body, encoding, None if weak else etag)
+            )
+            response.headers["Content-Encoding"] = encoding
+            return response
+
+    @app.errorhandler(404)
+    async def not_found(error):
+        """Handle 404 errors"""
+        return (
+            jsonify(
+                {
+                    "error": "Endpoint not found",
+                    "status": 404,
+                    "timestamp": datetime.utcnow().isoformat(),
+                }
+            ),
+            404,
+        )
+
+    @app.errorhandler(500)
+    async def internal_error(error):
+        """Handle 500 errors"""
+        logger.error("Internal server error: %s", error)
+        return (
+            jsonify(
+                {
+                    "error": "Internal server error",
+                    "status": 500,
+                    "timestamp": datetime.utcnow().isoformat(),
+                }
+            ),
+            500,
+        )
+
+    return app
+
+
+# Create the app instance
+app = create_asgi_app()
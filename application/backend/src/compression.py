@@ -0,0 +1,302 @@
+# application/backend/src/compression.py
+"""Response compression.
+
+Bodies above a size threshold are compressed with the best encoding the client
+accepts: zstd and brotli when the ``zstandard`` / ``brotli`` packages are
+installed, gzip always. Streamed responses are compressed chunk by chunk.
+A small LRU cache keyed by ETag holds the compressed bodies of responses with
+a strong ETag, and payloads routes have serialized, so a route that derives
+its ETag from a version token the database bumps on commit can skip
+serialization for data it has already sent. Requests whose If-None-Match
+matches the encoded ETag get a 304. Compression ratio and CPU time are
+reported by ``/api/stats``.
+"""
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Available encodings, preferred first when the client weights them equally
+ENCODINGS = tuple(
+    name
+    for name, module in (("zstd", zstandard), ("br", brotli), ("gzip", zlib))
+    if module is not None
+)
+# Levels that favour speed, since every request pays for them
+LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "application/json",
+        "application/javascript",
+        "text/css",
+        "text/csv",
+        "text/html",
+        "text/plain",
+    }
+)
+# Larger bodies are compressed on every request rather than held in memory
+MAX_CACHED_BODY = 1024 * 1024
+
+
+def negotiate(accept_encoding, encodings=ENCODINGS):
+    """Pick the encoding with the highest q-value in Accept-Encoding, if any"""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        name, params = name.strip().lower(), params.strip()
+        if not name:
+            continue
+        weight = 1.0
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def collection_etag(name, version):
+    """ETag for a collection from its commit-time version token, or None
+
+    A missing token means the version trigger is not installed (or nothing
+    has been written yet), and nothing tells a cached body is stale.
+    """
+    if version is None:
+        return None
+    return f"{name}-{version}"
+
+
+def json_envelope(fields, **serialized):
+    """JSON object of fields plus already serialized values, as bytes
+
+    Routes cache the expensive part of a payload and wrap it per request with
+    fields that change every time, such as a timestamp.
+    """
+    parts = [json.dumps(fields, separators=(",", ":"), default=str)[1:-1].encode()]
+    parts += [b'"%s":%s' % (name.encode(), value) for name, value in serialized.items()]
+    return b"{" + b",".join(part for part in parts if part) + b"}\n"
+
+
+def encoded_etag(etag, encoding):
+    """ETag of the encoded representation, distinct from the identity one"""
+    return f"{etag}-{encoding}"
+
+
+def encoder(encoding):
+    """Incremental compressor for encoding as (compress(chunk), finish())"""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(LEVELS["gzip"], zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=LEVELS["br"])
+        return compressor.process, compressor.finish
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=LEVELS["zstd"]).compressobj()
+        return compressor.compress, compressor.flush
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class ResponseCompressor:
+    """Compress eligible responses and cache bodies by ETag"""
+
+    def __init__(
+        self,
+        min_size=1024,
+        cache_size=64,
+        encodings=ENCODINGS,
+        mimetypes=COMPRESSIBLE_MIMETYPES,
+    ):
+        self.min_size = min_size
+        self.cache_size = cache_size
+        self.encodings = encodings
+        self.mimetypes = mimetypes
+
+        # gthread workers serve several requests per process at once
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._counters = {
+            "responses": 0,
+            "streamed_responses": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "cpu_seconds": 0.0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+        }
+
+    def negotiate(self, accept_encoding):
+        """Best encoding this compressor supports for an Accept-Encoding header"""
+        return negotiate(accept_encoding, self.encodings)
+
+    def eligible(self, response):
+        """Whether a response's type and status allow compressing it"""
+        return (
+            response.status_code == 200
+            and response.mimetype in self.mimetypes
+            and "Content-Encoding" not in response.headers
+        )
+
+    def compress(self, body, encoding, etag=None):
+        """Compressed body, served from the cache when the ETag was seen before"""
+        key = (etag, encoding)
+        if etag is not None:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        started = time.thread_time()
+        compress, finish = encoder(encoding)
+        compressed = compress(body) + finish()
+        self._record(len(body), len(compressed), time.thread_time() - started)
+
+        if etag is not None:
+            self._cache_put(key, compressed)
+        return compressed
+
+    def stream(self, chunks, encoding):
+        """Compress a streamed body chunk by chunk"""
+        compress, finish = encoder(encoding)
+        bytes_in = bytes_out = 0
+        cpu_seconds = 0.0
+        try:
+            for chunk in chunks:
+                started = time.thread_time()
+                compressed = compress(chunk)
+                cpu_seconds += time.thread_time() - started
+                bytes_in += len(chunk)
+                bytes_out += len(compressed)
+                if compressed:
+                    yield compressed
+
+            started = time.thread_time()
+            compressed = finish()
+            cpu_seconds += time.thread_time() - started
+            bytes_out += len(compressed)
+            yield compressed
+        finally:
+            self._record(bytes_in, bytes_out, cpu_seconds, streamed=True)
+
+    def cached_body(self, etag):
+        """Serialized content previously stored for etag, or None"""
+        if etag is None:
+            return None
+        return self._cache_get((etag, None))
+
+    def store_body(self, etag, body):
+        """Keep a serialized body so the next request for etag skips serialization"""
+        if etag is not None:
+            self._cache_put((etag, None), body)
+        return body
+
+    def stats(self):
+        """Compression and cache counters for this worker"""
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._cache)
+
+        bytes_in, bytes_out = counters["bytes_in"], counters["bytes_out"]
+        return {
+            "encodings": list(self.encodings),
+            "responses": counters["responses"],
+            "streamed_responses": counters["streamed_responses"],
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "ratio": round(bytes_in / bytes_out, 2) if bytes_out else None,
+            "cpu_ms": round(counters["cpu_seconds"] * 1000, 3),
+            "cache": {
+                "hits": counters["cache_hits"],
+                "misses": counters["cache_misses"],
+                "entries": entries,
+            },
+        }
+
+    def _record(self, bytes_in, bytes_out, cpu_seconds, streamed=False):
+        with self._lock:
+            self._counters["responses"] += 1
+            self._counters["streamed_responses"] += int(streamed)
+            self._counters["bytes_in"] += bytes_in
+            self._counters["bytes_out"] += bytes_out
+            self._counters["cpu_seconds"] += cpu_seconds
+
+    def _cache_get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self._counters["cache_misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return value
+
+    def _cache_put(self, key, value):
+        if self.cache_size <= 0 or len(value) > MAX_CACHED_BODY:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def init_compression(app):
+    """Compress responses on the way out and expose the body cache to routes"""
+    compressor = ResponseCompressor(
+        min_size=app.config.get("COMPRESSION_MIN_SIZE", 1024),
+        cache_size=app.config.get("COMPRESSION_CACHE_SIZE", 64),
+    )
+    app.extensions["compression"] = compressor
+    if not app.config.get("COMPRESSION_ENABLED", True):
+        return compressor
+
+    @app.after_request
+    def compress_response(response):
+        """Encode the body with the client's preferred encoding"""
+        if response.direct_passthrough or not compressor.eligible(response):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compressor.stream(response.iter_encoded(), encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < compressor.min_size:
+                return response
+            etag, weak = response.get_etag()
+            if etag is not None:
+                response.set_etag(encoded_etag(etag, encoding), weak)
+                if response.make_conditional(request).status_code == 304:
+                    return response
+            # A weak ETag allows the bytes to differ between requests
+            response.set_data(
+                compressor.compress(body, encoding, None if weak else etag)
+            )
+
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return compressor
@@ -30,8 +30,13 @@ class Config:
         )
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connections per worker process. gunicorn.conf.py sets these so that all
+    # workers together stay within DB_MAX_CONNECTIONS.
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
     SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_size": 10,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
         "pool_recycle": 120,
         "pool_pre_ping": True,
         "connect_args": {
@@ -39,9 +44,76 @@ class Config:
             "application_name": "infraprime-backend",
         },
     }
+    if SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        # SQLite uses a single-connection pool and rejects psycopg2 connect args
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # Create tables and api_calls partitions when the app is constructed.
+    # Test suites turn this off and build the schema once per session.
+    AUTO_CREATE_SCHEMA = True
+
+    # Async serving mode (src.asgi) - asyncpg takes its own connect args
+    ASYNC_SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": 120,
+        "pool_pre_ping": True,
+        "connect_args": {
+            "timeout": 30,
+            "server_settings": {"application_name": "infraprime-backend-async"},
+        },
+    }
+
+    # Delta sync only hands out changes older than this, so transactions still
+    # in flight (bounded by the 30s gunicorn worker timeout) are never skipped
+    USER_SYNC_SAFETY_LAG_SECONDS = int(
+        os.environ.get("USER_SYNC_SAFETY_LAG_SECONDS", "30")
+    )
+
+    # api_calls monthly partitions (Postgres only) and retention
+    API_CALLS_PARTITIONS_AHEAD = int(os.environ.get("API_CALLS_PARTITIONS_AHEAD", "3"))
+    API_CALLS_RETENTION_MONTHS = int(os.environ.get("API_CALLS_RETENTION_MONTHS", "3"))
+    # "drop" removes expired partitions, "detach" keeps them as standalone tables
+    API_CALLS_RETENTION_ACTION = os.environ.get("API_CALLS_RETENTION_ACTION", "drop")
+    # How often the gunicorn master repeats maintenance (0 disables the timer)
+    API_CALLS_MAINTENANCE_INTERVAL_SECONDS = int(
+        os.environ.get("API_CALLS_MAINTENANCE_INTERVAL_SECONDS", "21600")
+    )
+
+    # Admission control - shared across gunicorn workers forked with --preload
+    ADMISSION_CONTROL_ENABLED = (
+        os.environ.get("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+    )
+    ADMISSION_CLIENT_RATE = float(os.environ.get("ADMISSION_CLIENT_RATE", "20"))
+    ADMISSION_CLIENT_BURST = int(os.environ.get("ADMISSION_CLIENT_BURST", "40"))
+    ADMISSION_GLOBAL_RATE = float(os.environ.get("ADMISSION_GLOBAL_RATE", "200"))
+    ADMISSION_GLOBAL_BURST = int(os.environ.get("ADMISSION_GLOBAL_BURST", "400"))
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "32"))
+    ADMISSION_EXEMPT_PATHS = ("/health",)
+    # Proxies (IPs or CIDRs) whose X-Real-IP header names the client. Requests
+    # from anywhere else are keyed on their own address, so a client reaching
+    # the published port directly cannot pick a fresh identity per request.
+    ADMISSION_TRUSTED_PROXIES = [
+        proxy.strip()
+        for proxy in os.environ.get("ADMISSION_TRUSTED_PROXIES", "").split(",")
+        if proxy.strip()
+    ]
+
+    # Response compression (gzip, plus brotli/zstd when installed)
+    COMPRESSION_ENABLED = (
+        os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+    )
+    # Bodies smaller than this are sent as-is
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+    # Serialized and compressed bodies kept per worker, keyed by ETag
+    COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", "64"))
 
     # CORS settings
     ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "*")
 
     # Logging configuration
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # Records queued for the JSON writer thread before new ones are dropped
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+    # Per-logger sampling of sub-WARNING records, e.g. "src.requests=0.1"
+    LOG_SAMPLING = os.environ.get("LOG_SAMPLING", "")
@@ -0,0 +1,204 @@
+# application/backend/src/instances.py
+"""Process start tracking for uptime reporting.
+
+The first app created in a process records the service boot time in an
+anonymous shared memory region. Every process forked from it (gunicorn
+workers under ``preload_app``) records its PID, start time, version and host in
+a slot of the same region, and gunicorn's ``child_exit`` hook frees the slot,
+counts the restart and releases the lock if the worker died holding it. ``/api/stats`` reads uptime from here instead of the database.
+"""
+import logging
+import mmap
+import multiprocessing
+import os
+import socket
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Service boot time, master PID, worker restarts, last recycle time (0 = never),
+# PID holding the lock
+HEADER = struct.Struct("dqqdq")
+# Worker PID (0 = free), worker start time, version, host (NUL padded UTF-8)
+SLOT = struct.Struct("qd32s64s")
+# Seconds to wait for the shared lock before going ahead without it
+LOCK_TIMEOUT = 1
+
+logger = logging.getLogger(__name__)
+_registry = None
+
+
+class InstanceRegistry:
+    """Boot time of the service and of every worker forked from it"""
+
+    def __init__(self, slots=64, version="unknown"):
+        self.slots = slots
+        self.version = version
+
+        # Anonymous mappings and semaphores are inherited across fork()
+        self._memory = mmap.mmap(-1, HEADER.size + slots * SLOT.size)
+        self._lock = multiprocessing.Lock()
+        HEADER.pack_into(self._memory, 0, time.time(), os.getpid(), 0, 0.0, 0)
+
+    def register(self, pid=None, started_at=None, version=None, host=None):
+        """Record a worker's start, reusing its slot or the oldest one if full"""
+        pid = pid or os.getpid()
+        started_at = started_at or time.time()
+        version = (version or self.version).encode()
+        host = (host or hostname()).encode()
+        with self._locked():
+            offset = self._slot(pid)
+            SLOT.pack_into(self._memory, offset, pid, started_at, version, host)
+
+    def unregister(self, pid):
+        """Free an exited worker's slot, count the restart and free its lock"""
+        # Any process may release a multiprocessing.Lock; only the master does
+        # so here, and only for a holder that is known to be dead
+        if HEADER.unpack_from(self._memory, 0)[4] == pid:
+            self._release_lock()
+            logger.warning(
+                "Released instance registry lock held by exited worker %s", pid
+            )
+
+        with self._locked():
+            booted_at, master_pid, restarts, _, holder = HEADER.unpack_from(
+                self._memory, 0
+            )
+            HEADER.pack_into(
+                self._memory,
+                0,
+                booted_at,
+                master_pid,
+                restarts + 1,
+                time.time(),
+                holder,
+            )
+            for offset in self._offsets():
+                if SLOT.unpack_from(self._memory, offset)[0] == pid:
+                    SLOT.pack_into(self._memory, offset, 0, 0.0, b"", b"")
+
+    def snapshot(self, version="unknown", host=None):
+        """Uptime of this process and of the service, without touching the database"""
+        now = time.time()
+        pid = os.getpid()
+        with self._locked():
+            booted_at, master_pid, restarts, last_recycle, _ = HEADER.unpack_from(
+                self._memory, 0
+            )
+            workers = [
+                SLOT.unpack_from(self._memory, offset) for offset in self._offsets()
+            ]
+
+        workers = sorted(worker for worker in workers if worker[0])
+        # The master serves requests itself when nothing was forked (dev server)
+        started_at = {worker[0]: worker[1] for worker in workers}.get(pid, booted_at)
+
+        return {
+            "instance": {
+                "pid": pid,
+                "host": host or hostname(),
+                "version": version,
+                "started_at": isoformat(started_at),
+                "uptime_seconds": round(now - started_at, 3),
+            },
+            "fleet": {
+                "master_pid": master_pid,
+                "started_at": isoformat(booted_at),
+                "uptime_seconds": round(now - booted_at, 3),
+                "workers": [
+                    {
+                        "pid": worker_pid,
+                        "version": decode(worker_version),
+                        "host": decode(worker_host),
+                        "started_at": isoformat(worker_started),
+                        "uptime_seconds": round(now - worker_started, 3),
+                    }
+                    for worker_pid, worker_started, worker_version, worker_host in workers
+                ],
+                "worker_restarts": restarts,
+                "last_recycle_at": isoformat(last_recycle) if last_recycle else None,
+            },
+        }
+
+    @contextmanager
+    def _locked(self):
+        """Hold the shared lock, or carry on without it after LOCK_TIMEOUT.
+
+        A worker killed while holding the lock must not hang the master, new
+        workers or /api/stats; an unlocked read or write at worst shows one
+        slot mid-update.
+        """
+        locked = self._lock.acquire(timeout=LOCK_TIMEOUT)
+        if locked:
+            self._set_holder(os.getpid())
+        else:
+            logger.warning("Instance registry lock unavailable, proceeding without it")
+        try:
+            yield
+        finally:
+            if locked:
+                self._release_lock()
+
+    def _set_holder(self, pid):
+        header = HEADER.unpack_from(self._memory, 0)
+        HEADER.pack_into(self._memory, 0, *header[:4], pid)
+
+    def _release_lock(self):
+        self._set_holder(0)
+        self._lock.release()
+
+    def _offsets(self):
+        return range(HEADER.size, HEADER.size + self.slots * SLOT.size, SLOT.size)
+
+    def _slot(self, pid):
+        """Find the slot holding pid, else a free or the oldest slot"""
+        victim, victim_started = None, None
+        for offset in self._offsets():
+            slot_pid, slot_started, _, _ = SLOT.unpack_from(self._memory, offset)
+            if slot_pid == pid or slot_pid == 0:
+                return offset
+            if victim is None or slot_started < victim_started:
+                victim, victim_started = offset, slot_started
+        return victim
+
+
+def hostname():
+    """Container hostname as docker sets it, else the kernel's"""
+    return os.getenv("HOSTNAME") or socket.gethostname()
+
+
+def decode(field):
+    """Text of a NUL-padded struct field"""
+    return field.rstrip(b"\0").decode(errors="replace")
+
+
+def isoformat(timestamp):
+    """UTC ISO 8601 string for a Unix timestamp"""
+    return datetime.utcfromtimestamp(timestamp).isoformat()
+
+
+def format_uptime(seconds):
+    """Render seconds as the "<hours>h <minutes>m" string /api/stats has always used"""
+    return f"{int(seconds // 3600)}h {int((seconds % 3600) // 60)}m"
+
+
+def register_worker():
+    """Record this process's start; runs in every child forked after init"""
+    if _registry is not None:
+        _registry.register()
+
+
+def worker_exited(pid):
+    """Count a worker restart; called from gunicorn's child_exit hook"""
+    if _registry is not None:
+        _registry.unregister(pid)
+
+
+def init_instance_registry(slots=64, version="unknown"):
+    """Create this process tree's registry once, before any worker forks"""
+    global _registry
+    if _registry is None:
+        _registry = InstanceRegistry(slots, version)
+        os.register_at_fork(after_in_child=register_worker)
+    return _registry
@@ -0,0 +1,259 @@
+# application/backend/src/logging_setup.py
+"""Non-blocking structured logging.
+
+Request threads only put records on a bounded in-memory queue; a background
+QueueListener thread formats them as JSON and writes them to stdout. When the
+queue is full records are dropped and counted rather than blocking the request.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+# Attributes every LogRecord has; anything else came in through extra=
+RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_handler = None
+_listener = None
+_listener_pid = None
+# Request ID of the asyncio task serving a request; src.asgi has no flask.g
+asgi_request_id = contextvars.ContextVar("asgi_request_id", default=None)
+
+
+class JSONFormatter(logging.Formatter):
+    """Render each record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Write to whatever sys.stdout is when the record is emitted"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+
+class RequestContextFilter(logging.Filter):
+    """Tag records with the current request ID on the request thread or task"""
+
+    def filter(self, record):
+        if has_request_context() and "request_id" in g:
+            record.request_id = g.request_id
+        elif asgi_request_id.get() is not None:
+            record.request_id = asgi_request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of sub-WARNING records from noisy loggers"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates.items():
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that counts and drops records instead of blocking"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        # Leave msg % args to the listener; only tracebacks must be rendered
+        # here because they reference live frames on this thread
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # handle() already holds self.lock around emit(); taking the RLock again
+        # keeps the counters exact for threads that enqueue directly
+        with self.lock:
+            self._enqueue(record)
+
+    def _enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+
+        if self._unreported:
+            dropped, self._unreported = self._unreported, 0
+            warning = logging.makeLogRecord(
+                {
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": "Dropped %d log records, queue was full",
+                    "args": (dropped,),
+                    "dropped_total": self.dropped,
+                }
+            )
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                self._unreported += dropped
+
+
+def parse_sampling(value):
+    """Parse "logger=rate,logger=rate" into a {logger: rate} mapping"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def start_log_listener():
+    """Start this process's writer thread; safe to call again, e.g. after fork"""
+    global _listener, _listener_pid
+    if _handler is None or _listener_pid == os.getpid():
+        return
+
+    _handler.queue = queue.Queue(_handler.queue.maxsize)
+    stdout = StdoutHandler()
+    stdout.setFormatter(JSONFormatter())
+    _listener = QueueListener(_handler.queue, stdout)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def _stop_listener():
+    """Flush queued records before the process exits"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def configure_logging(level="INFO", queue_size=10000, sampling=None):
+    """Route the root logger through a bounded queue to a JSON writer thread"""
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(str(level).upper())
+
+    if _handler is not None:
+        _handler.filters = [
+            f for f in _handler.filters if not isinstance(f, SamplingFilter)
+        ]
+    else:
+        _handler = DroppingQueueHandler(queue.Queue(queue_size))
+        _handler.addFilter(RequestContextFilter())
+        root.addHandler(_handler)
+        start_log_listener()
+        # Listener threads do not survive fork(); gunicorn workers need their own
+        os.register_at_fork(after_in_child=start_log_listener)
+        atexit.register(_stop_listener)
+
+    rates = parse_sampling(sampling)
+    if rates:
+        _handler.addFilter(SamplingFilter(rates))
+    return _handler
+
+
+def dropped_log_records():
+    """Records discarded because the queue was full"""
+    return _handler.dropped if _handler is not None else 0
+
+
+def log_request(method, path, status, started):
+    """Log one timed line for a finished request"""
+    duration_ms = (time.perf_counter() - started) * 1000
+    logging.getLogger("src.requests").info(
+        "%s %s %s",
+        method,
+        path,
+        status,
+        extra={
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+        },
+    )
+
+
+def init_request_logging(app):
+    """Assign request IDs and log one timed line per request"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request_line(response):
+        if "request_started" not in g:
+            return response
+
+        response.headers["X-Request-ID"] = g.request_id
+        log_request(
+            request.method, request.path, response.status_code, g.request_started
+        )
+        return response
+
+
+def init_asgi_request_logging(app):
+    """Request IDs and timed request lines for src.asgi"""
+    # Only the async serving mode needs Quart
+    from quart import g, request
+
+    @app.before_request
+    async def start_request_timer():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+        asgi_request_id.set(g.request_id)
+
+    @app.after_request
+    async def log_request_line(response):
+        if "request_started" not in g:
+            return response
+
+        response.headers["X-Request-ID"] = g.request_id
+        log_request(
+            request.method, request.path, response.status_code, g.request_started
+        )
+        return response
@@ -2,6 +2,7 @@ import uuid
 from datetime import datetime
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
@@ -11,6 +12,10 @@ class User(db.Model):
     """User model for storing user information"""
 
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset index for delta sync: (updated_at, id) breaks timestamp ties
+        db.Index("idx_users_updated_at_id", "updated_at", "id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
@@ -34,6 +39,127 @@ class User(db.Model):
         }
 
 
+class UserTombstone(db.Model):
+    """Marker left behind when a user is deleted, for delta sync clients"""
+
+    __tablename__ = "user_tombstones"
+    __table_args__ = (
+        db.Index("idx_user_tombstones_deleted_at_user_id", "deleted_at", "user_id"),
+    )
+
+    user_id = db.Column(db.String(36), primary_key=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserTombstone {self.user_id}>"
+
+    def to_dict(self):
+        """Convert tombstone object to dictionary"""
+        return {
+            "id": self.user_id,
+            "deleted_at": self.deleted_at.isoformat() if self.deleted_at else None,
+        }
+
+
+# Tombstones are written by the database, not an ORM hook, so deletes that
+# bypass the ORM (admin SQL, bulk deletes) are recorded too. 01-init.sql
+# installs the same trigger on the Postgres container; these cover schemas
+# built by create_all.
+TOMBSTONE_TRIGGERS = [
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION record_user_tombstone()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO user_tombstones (user_id, deleted_at)
+            VALUES (OLD.id, NOW())
+            ON CONFLICT (user_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE TRIGGER record_users_tombstone AFTER DELETE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION record_user_tombstone()"
+    ).execute_if(dialect="postgresql"),
+    # Writes the "YYYY-MM-DD HH:MM:SS.ffffff" text SQLAlchemy reads back
+    DDL(
+        """
+        CREATE TRIGGER IF NOT EXISTS record_users_tombstone AFTER DELETE ON users
+        FOR EACH ROW BEGIN
+            INSERT OR REPLACE INTO user_tombstones (user_id, deleted_at)
+            VALUES (OLD.id, strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now') || '000');
+        END
+        """
+    ).execute_if(dialect="sqlite"),
+]
+for trigger in TOMBSTONE_TRIGGERS:
+    event.listen(User.__table__, "after_create", trigger)
+
+
+class CollectionVersion(db.Model):
+    """Opaque token that changes whenever a write to a collection commits"""
+
+    __tablename__ = "collection_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+    @classmethod
+    def current(cls, name):
+        """Statement reading a collection's version token"""
+        return db.select(cls.version).where(cls.name == name)
+
+
+# Bumped by the database when a write to users runs, so the new token becomes
+# visible exactly when that write commits; updated_at is stamped when the
+# transaction starts and cannot tell a late commit apart. The row lock orders
+# concurrent writers, and the sequence never hands out a token twice, even
+# across rolled back transactions.
+USERS_VERSION_TRIGGERS = [
+    DDL("CREATE SEQUENCE IF NOT EXISTS collection_version_seq").execute_if(
+        dialect="postgresql"
+    ),
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION bump_users_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO collection_versions (name, version)
+            VALUES ('users', nextval('collection_version_seq'))
+            ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE TRIGGER bump_users_version "
+        "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_users_version()"
+    ).execute_if(dialect="postgresql"),
+    # SQLite has neither sequences nor statement triggers; a random 64-bit
+    # token per row written serves the same purpose
+    *(
+        DDL(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS bump_users_version_on_{operation}
+            AFTER {operation} ON users
+            FOR EACH ROW BEGIN
+                INSERT INTO collection_versions (name, version)
+                VALUES ('users', random())
+                ON CONFLICT (name) DO UPDATE SET version = excluded.version;
+            END
+            """
+        ).execute_if(dialect="sqlite")
+        for operation in ("insert", "update", "delete")
+    ),
+]
+for trigger in USERS_VERSION_TRIGGERS:
+    event.listen(User.__table__, "after_create", trigger)
+
+
 class APICall(db.Model):
     """Model for tracking API calls for analytics"""
 
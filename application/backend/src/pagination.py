@@ -0,0 +1,74 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+
+def encode_watermark(timestamp, row_id):
+    """Encode a (timestamp, id) keyset position as an opaque token"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_watermark(token):
+    """Decode a watermark token, or a bare ISO timestamp, into (timestamp, id)"""
+    try:
+        return datetime.fromisoformat(token), None
+    except ValueError:
+        pass
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, row_id = raw.split("|", 1)
+        # ids are UUID columns on Postgres; reject anything else here, not in SQL
+        return datetime.fromisoformat(timestamp), str(uuid.UUID(row_id))
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+
+
+def settled_cutoff(lag_seconds, now=None):
+    """Newest change timestamp safe to hand out in a watermark
+
+    updated_at is stamped when a transaction starts, not when it commits, so a
+    row can become visible with a timestamp older than rows a client has
+    already synced past. Changes are only returned once they are older than
+    the longest transaction can run.
+    """
+    return (now or datetime.utcnow()) - timedelta(seconds=lag_seconds)
+
+
+def keyset_after(timestamp_column, id_column, watermark):
+    """Build a filter for rows strictly after the watermark in (timestamp, id) order"""
+    timestamp, row_id = watermark
+    if row_id is None:
+        return timestamp_column > timestamp
+    return or_(
+        timestamp_column > timestamp,
+        and_(timestamp_column == timestamp, id_column > row_id),
+    )
+
+
+def changes_page(users, tombstones, limit, since=None):
+    """Merge user and tombstone rows into one (timestamp, id) ordered page"""
+    changes = sorted(
+        [(u.updated_at, u.id, "user", u) for u in users]
+        + [(t.deleted_at, t.user_id, "deleted", t) for t in tombstones],
+        key=lambda change: (change[0], change[1]),
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    next_since = since
+    if changes:
+        next_since = encode_watermark(changes[-1][0], changes[-1][1])
+
+    return {
+        "users": [c[3].to_dict() for c in changes if c[2] == "user"],
+        "deleted": [c[3].to_dict() for c in changes if c[2] == "deleted"],
+        "count": len(changes),
+        "next_since": next_since,
+        "has_more": has_more,
+    }
@@ -0,0 +1,262 @@
+# application/backend/src/partitions.py
+"""Monthly range partitions for the api_calls table.
+
+On Postgres, docker/database/init/01-init.sql creates api_calls partitioned by
+timestamp. The helpers here keep upcoming monthly partitions in place and
+enforce retention by detaching (and by default dropping) whole partitions
+instead of running large DELETEs. On any other database, or when api_calls
+was created as a plain table, they do nothing.
+
+Rows that arrive while no partition covers their month land in
+api_calls_default. Postgres refuses to create a partition overlapping rows in
+the default partition, so those rows are moved into the new partition before it
+is attached; stranded rows already past retention are dropped or archived
+instead. Detached partitions are renamed to api_calls_archived_YYYY_MM. The
+gunicorn master repeats maintenance on a timer so a long-running deployment
+never runs out of partitions.
+"""
+import logging
+import re
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+PARTITION_NAME = re.compile(r"^api_calls_p(\d{4})_(\d{2})$")
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month, months):
+    """First day of the month `months` after `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def retention_start(retain_months, today=None):
+    """Oldest timestamp kept when retaining `retain_months` whole months"""
+    this_month = (today or datetime.utcnow().date()).replace(day=1)
+    start = add_months(this_month, -retain_months)
+    return datetime(start.year, start.month, start.day)
+
+
+def is_partitioned(conn):
+    """Whether api_calls is a partitioned Postgres table"""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = 'api_calls'"
+            )
+        ).first()
+    )
+
+
+def monthly_partitions(conn):
+    """Map the first day of each month to its api_calls partition name"""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'api_calls'"
+        )
+    )
+    partitions = {}
+    for (name,) in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def default_partition_months(conn):
+    """First day of each month with rows stranded in api_calls_default"""
+    rows = conn.execute(
+        text(
+            "SELECT DISTINCT date_trunc('month', timestamp)::date "
+            "FROM api_calls_default"
+        )
+    )
+    return {month for (month,) in rows}
+
+
+def create_partition(conn, month, stranded=False):
+    """Create the partition for `month`, moving its rows out of the default one"""
+    name = f"api_calls_p{month:%Y_%m}"
+    bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+    if not stranded:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF api_calls "
+                f"FOR VALUES {bounds}"
+            )
+        )
+        return name
+
+    # Attaching checks the default partition holds no rows in the new range
+    conn.execute(
+        text(
+            f"CREATE TABLE {name} "
+            "(LIKE api_calls INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    moved = conn.execute(
+        text(
+            "WITH moved AS (DELETE FROM api_calls_default "
+            f"WHERE timestamp >= '{month}' AND timestamp < '{add_months(month, 1)}' "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        )
+    ).rowcount
+    conn.execute(
+        text(f"ALTER TABLE api_calls ATTACH PARTITION {name} FOR VALUES {bounds}")
+    )
+    logger.warning(
+        "Moved %s api_calls rows from api_calls_default into %s", moved, name
+    )
+    return name
+
+
+def create_partitions(conn, months_ahead, today=None, retain_from=None):
+    """Create this month's partition, `months_ahead` more and retained stranded ones"""
+    this_month = (today or datetime.utcnow().date()).replace(day=1)
+    existing = monthly_partitions(conn)
+    stranded = {
+        month
+        for month in default_partition_months(conn)
+        if retain_from is None or add_months(month, 1) > retain_from
+    }
+    months = {add_months(this_month, offset) for offset in range(months_ahead + 1)}
+    created = []
+    for month in sorted(months | stranded):
+        if month in existing:
+            continue
+        created.append(create_partition(conn, month, month in stranded))
+    return created
+
+
+def table_exists(conn, name):
+    """Whether a table called `name` exists, attached or not"""
+    return (
+        conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        is not None
+    )
+
+
+def archive(conn, name, month):
+    """Keep a detached partition's rows in api_calls_archived_YYYY_MM.
+
+    Detached partitions are renamed so that a later partition for the same
+    month (after stranded rows or a longer retention) cannot collide with them.
+    """
+    archived = f"api_calls_archived_{month:%Y_%m}"
+    if table_exists(conn, archived):
+        conn.execute(text(f"INSERT INTO {archived} SELECT * FROM {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+    else:
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {archived}"))
+    return archived
+
+
+def expire_default_rows(conn, cutoff, drop=True):
+    """Drop or archive rows stranded in api_calls_default before the cutoff"""
+    expired = []
+    for month in sorted(default_partition_months(conn)):
+        if add_months(month, 1) > cutoff:
+            continue
+
+        where = f"WHERE timestamp >= '{month}' AND timestamp < '{add_months(month, 1)}'"
+        if drop:
+            conn.execute(text(f"DELETE FROM api_calls_default {where}"))
+        else:
+            archived = f"api_calls_archived_{month:%Y_%m}"
+            conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {archived} "
+                    "(LIKE api_calls INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+            )
+            conn.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM api_calls_default {where} "
+                    f"RETURNING *) INSERT INTO {archived} SELECT * FROM moved"
+                )
+            )
+        expired.append(f"api_calls_default ({month:%Y-%m})")
+    return expired
+
+
+def expire_partitions(conn, retain_months, drop=True, today=None):
+    """Detach, then drop or archive, partitions entirely before the retention window"""
+    cutoff = retention_start(retain_months, today).date()
+    expired = []
+    for month, name in sorted(monthly_partitions(conn).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+
+        conn.execute(text(f"ALTER TABLE api_calls DETACH PARTITION {name}"))
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            archive(conn, name, month)
+        expired.append(name)
+    return expired + expire_default_rows(conn, cutoff, drop)
+
+
+def maintain_api_call_partitions(conn, months_ahead=3, retain_months=3, drop=True):
+    """Create upcoming partitions and expire old ones; a no-op without partitioning"""
+    if not is_partitioned(conn):
+        return
+
+    cutoff = retention_start(retain_months).date()
+    created = create_partitions(conn, months_ahead, retain_from=cutoff)
+    expired = expire_partitions(conn, retain_months, drop)
+    if created or expired:
+        logger.info("api_calls partitions created: %s, expired: %s", created, expired)
+
+
+def maintenance_options(config):
+    """Keyword arguments for maintain_api_call_partitions from app config"""
+    return {
+        "months_ahead": config.get("API_CALLS_PARTITIONS_AHEAD", 3),
+        "retain_months": config.get("API_CALLS_RETENTION_MONTHS", 3),
+        "drop": config.get("API_CALLS_RETENTION_ACTION", "drop") == "drop",
+    }
+
+
+def maintain_database(database_uri, **options):
+    """Run maintenance on a connection of its own, outside any app's pool"""
+    engine = create_engine(database_uri, poolclass=NullPool)
+    try:
+        with engine.begin() as conn:
+            maintain_api_call_partitions(conn, **options)
+    finally:
+        engine.dispose()
+
+
+def start_maintenance_timer(config):
+    """Repeat maintenance on a daemon thread; returns an Event that stops it.
+
+    Runs in the gunicorn master only, so the DDL is never raced by workers.
+    """
+    interval = config.get("API_CALLS_MAINTENANCE_INTERVAL_SECONDS", 21600)
+    if interval <= 0:
+        return None
+
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            try:
+                maintain_database(
+                    config["SQLALCHEMY_DATABASE_URI"], **maintenance_options(config)
+                )
+            except Exception as e:
+                logger.error("Error maintaining api_calls partitions: %s", e)
+
+    threading.Thread(target=run, name="api-calls-maintenance", daemon=True).start()
+    return stopped
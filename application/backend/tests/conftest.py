@@ -5,8 +5,14 @@ Test configuration and utilities for InfraPrime backend tests
 import pytest
 import os
 import tempfile
+import uuid
+from datetime import datetime, timedelta
 from unittest.mock import Mock
 
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+
 # Test configuration
 class TestConfig:
     """Configuration for testing environment"""
@@ -17,18 +23,174 @@ class TestConfig:
     JWT_SECRET_KEY = 'test-jwt-secret-never-use-in-production'
     WTF_CSRF_ENABLED = False
     PRESERVE_CONTEXT_ON_EXCEPTION = False
+    ENVIRONMENT = 'testing'
+    VERSION = '1.0.0'
+    # The session-scoped app fixture builds the schema once
+    AUTO_CREATE_SCHEMA = False
+    # Tests read their own writes straight away
+    USER_SYNC_SAFETY_LAG_SECONDS = 0
+
+def worker_database_url():
+    """One database per pytest-xdist worker
+
+    In-memory SQLite is already private to each worker process. With
+    TEST_DATABASE_URL pointing at Postgres, each worker gets its own database
+    named after the worker (e.g. infraprime_test_gw0), created on demand.
+    """
+    base_url = os.environ.get('TEST_DATABASE_URL')
+    if not base_url:
+        return 'sqlite:///:memory:'
+
+    url = make_url(base_url)
+    worker = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+    name = f'{url.database}_{worker}'
+
+    admin = create_engine(url.set(database='postgres'), isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        exists = conn.execute(text('SELECT 1 FROM pg_database WHERE datname = :name'),
+                              {'name': name}).first()
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+
+    return url.set(database=name).render_as_string(hide_password=False)
 
 def pytest_configure():
     """Configure pytest"""
     # Set environment variables for testing
     os.environ['FLASK_ENV'] = 'testing'
     os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    TestConfig.SQLALCHEMY_DATABASE_URI = worker_database_url()
 
 @pytest.fixture(scope='session')
 def app_config():
     """App configuration fixture"""
     return TestConfig
 
+@pytest.fixture(scope='session')
+def app(app_config):
+    """Create the application and its schema once per test session"""
+    from src.app import create_app
+    from src.models import db
+
+    app = create_app(app_config)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # pysqlite emits its own BEGINs and breaks SAVEPOINT; take over
+            @event.listens_for(db.engine, 'connect')
+            def disable_pysqlite_transactions(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+
+            @event.listens_for(db.engine, 'begin')
+            def emit_begin(conn):
+                conn.exec_driver_sql('BEGIN')
+
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def db_session(app, monkeypatch):
+    """Run each test in a transaction that is rolled back afterwards
+
+    Every session the app opens is bound to one connection, and commit()
+    only releases a SAVEPOINT, so tests see their own writes while nothing
+    reaches the schema shared by the rest of the session. A plain SQLAlchemy
+    session honours its bind, where Flask-SQLAlchemy's would pick the engine.
+    """
+    from src.models import db
+
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        session = scoped_session(sessionmaker(
+            bind=connection,
+            join_transaction_mode='create_savepoint',
+        ))
+        monkeypatch.setattr(db, 'session', session)
+
+        yield session
+
+        session.remove()
+        transaction.rollback()
+        connection.close()
+
+@pytest.fixture(autouse=True)
+def isolate_database(request):
+    """Roll back every test that touches the app, even through `app` alone"""
+    if 'app' in request.fixturenames:
+        request.getfixturevalue('db_session')
+
+@pytest.fixture
+def client(app, db_session):
+    """Test client"""
+    return app.test_client()
+
+@pytest.fixture
+def sample_users(app, db_session):
+    """Create sample users for testing"""
+    from src.models import User
+
+    user1 = User(name='Test User 1', email='test1@example.com')
+    user2 = User(name='Test User 2', email='test2@example.com')
+
+    db_session.add(user1)
+    db_session.add(user2)
+    db_session.commit()
+
+    return [user1, user2]
+
+@pytest.fixture
+def make_users(db_session):
+    """Factory that bulk-inserts users in a single statement"""
+    from src.models import User
+
+    def make(count, **fields):
+        now = datetime.utcnow()
+        rows = [
+            {
+                'id': str(uuid.uuid4()),
+                'name': f'User {i}',
+                'email': f'user{i}-{uuid.uuid4().hex[:8]}@example.com',
+                'created_at': now,
+                'updated_at': now,
+                **fields,
+            }
+            for i in range(count)
+        ]
+        db_session.execute(insert(User), rows)
+        db_session.commit()
+        return rows
+
+    return make
+
+@pytest.fixture
+def make_api_calls(db_session):
+    """Factory that bulk-inserts api_calls spaced `interval` apart"""
+    from src.models import APICall
+
+    def make(count, endpoint='/api/data', method='GET', start=None,
+             interval=timedelta(seconds=1)):
+        start = start or datetime.utcnow() - count * interval
+        rows = [
+            {
+                'id': str(uuid.uuid4()),
+                'endpoint': endpoint,
+                'method': method,
+                'timestamp': start + i * interval,
+                'user_agent': 'pytest',
+                'ip_address': '127.0.0.1',
+            }
+            for i in range(count)
+        ]
+        db_session.execute(insert(APICall), rows)
+        db_session.commit()
+        return rows
+
+    return make
+
 # Common test utilities
 def assert_json_response(response, expected_status=200):
     """Assert JSON response format and status"""
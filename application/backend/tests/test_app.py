@@ -4,53 +4,32 @@ Run with: python -m pytest tests/ -v --cov=src --cov-report=html
 """
 
 import pytest
+import base64
+import gzip
 import json
+import logging
 import os
+import queue
+import runpy
+import signal
 import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import update
 
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from src.admission import AdmissionController, client_address, trusted_networks
 from src.app import create_app
+from src.compression import ResponseCompressor, negotiate
+from src.instances import InstanceRegistry, format_uptime
+from src.logging_setup import DroppingQueueHandler, JSONFormatter, SamplingFilter
 from src.models import db, User, APICall
-
-class TestConfig:
-    """Test configuration"""
-    TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = 'test-secret-key'
-    ENVIRONMENT = 'testing'
-    VERSION = '1.0.0'
-
-@pytest.fixture
-def app():
-    """Create application for testing"""
-    app = create_app(TestConfig)
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-@pytest.fixture
-def client(app):
-    """Test client"""
-    return app.test_client()
-
-@pytest.fixture
-def sample_users(app):
-    """Create sample users for testing"""
-    with app.app_context():
-        user1 = User(name='Test User 1', email='test1@example.com')
-        user2 = User(name='Test User 2', email='test2@example.com')
-        
-        db.session.add(user1)
-        db.session.add(user2)
-        db.session.commit()
-        
-        return [user1, user2]
+from src.partitions import (add_months, create_partitions, expire_partitions, is_partitioned,
+                            maintain_api_call_partitions, retention_start, start_maintenance_timer)
 
 class TestHealthEndpoints:
     """Test health check endpoints"""
@@ -183,6 +162,119 @@ class TestUsersEndpoints:
         assert 'error' in data
         assert 'already exists' in data['error']
 
+class TestUserChangesEndpoint:
+    """Test /api/users/changes delta sync endpoint"""
+
+    def test_changes_initial_sync(self, client, sample_users):
+        """Test first sync returns every user and a watermark"""
+        response = client.get('/api/users/changes')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['count'] == 2
+        assert len(data['users']) == 2
+        assert data['deleted'] == []
+        assert data['has_more'] is False
+        assert data['next_since']
+
+    def test_changes_after_watermark_is_empty(self, client, sample_users):
+        """Test nothing is returned when nothing changed"""
+        first = json.loads(client.get('/api/users/changes').data)
+        response = client.get(f"/api/users/changes?since={first['next_since']}")
+
+        data = json.loads(response.data)
+        assert data['count'] == 0
+        assert data['next_since'] == first['next_since']
+
+    def test_changes_pages_through_equal_timestamps(self, app, client):
+        """Test keyset paging does not skip or repeat tied timestamps"""
+        with app.app_context():
+            stamp = datetime(2025, 1, 1, 12, 0, 0)
+            for i in range(5):
+                db.session.add(User(name=f'Tie {i}', email=f'tie{i}@example.com',
+                                    created_at=stamp, updated_at=stamp))
+            db.session.commit()
+
+        seen = []
+        since = ''
+        while True:
+            data = json.loads(client.get(f'/api/users/changes?limit=2&since={since}').data)
+            seen.extend(user['email'] for user in data['users'])
+            since = data['next_since']
+            if not data['has_more']:
+                break
+
+        assert sorted(seen) == [f'tie{i}@example.com' for i in range(5)]
+
+    def test_changes_reports_updates_and_deletions(self, app, client, sample_users):
+        """Test updated users and tombstones after the watermark"""
+        first = json.loads(client.get('/api/users/changes').data)
+
+        with app.app_context():
+            updated = User.query.filter_by(email='test1@example.com').first()
+            updated.name = 'Renamed User'
+            deleted = User.query.filter_by(email='test2@example.com').first()
+            deleted_id = deleted.id
+            db.session.delete(deleted)
+            db.session.commit()
+
+        response = client.get(f"/api/users/changes?since={first['next_since']}")
+        data = json.loads(response.data)
+        assert [user['name'] for user in data['users']] == ['Renamed User']
+        assert [tombstone['id'] for tombstone in data['deleted']] == [deleted_id]
+
+    def test_changes_records_deletes_outside_the_orm(self, app, client, sample_users):
+        """Test raw SQL deletes still leave tombstones"""
+        first = json.loads(client.get('/api/users/changes').data)
+
+        with app.app_context():
+            deleted_id = User.query.filter_by(email='test2@example.com').first().id
+            db.session.execute(db.text('DELETE FROM users WHERE id = :id'), {'id': deleted_id})
+            db.session.commit()
+
+        data = json.loads(client.get(f"/api/users/changes?since={first['next_since']}").data)
+        assert [tombstone['id'] for tombstone in data['deleted']] == [deleted_id]
+
+    def test_changes_hold_back_unsettled_rows(self, app, client, sample_users):
+        """Test rows inside the safety lag are not handed out or passed by the watermark"""
+        first = json.loads(client.get('/api/users/changes').data)
+
+        with app.app_context():
+            stamp = datetime.utcnow() + timedelta(hours=1)
+            db.session.add(User(name='Pending', email='pending@example.com', updated_at=stamp))
+            db.session.commit()
+
+        data = json.loads(client.get(f"/api/users/changes?since={first['next_since']}").data)
+        assert data['users'] == []
+        assert data['next_since'] == first['next_since']
+
+    def test_changes_pages_through_bulk_users(self, client, make_users):
+        """Test a large seeded user list is returned exactly once across pages"""
+        make_users(250)
+
+        seen = []
+        since = ''
+        while True:
+            data = json.loads(client.get(f'/api/users/changes?limit=100&since={since}').data)
+            seen.extend(user['id'] for user in data['users'])
+            since = data['next_since']
+            if not data['has_more']:
+                break
+
+        assert len(seen) == len(set(seen)) == 250
+
+    def test_changes_invalid_watermark(self, client):
+        """Test an unparseable watermark is rejected"""
+        response = client.get('/api/users/changes?since=not-a-watermark')
+        assert response.status_code == 400
+
+    def test_changes_watermark_with_invalid_id(self, client):
+        """Test a watermark whose id is not a UUID is rejected before the query"""
+        since = base64.urlsafe_b64encode(b'2025-01-01T00:00:00|zzz').decode()
+        response = client.get(f'/api/users/changes?since={since}')
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == 'Invalid since watermark'
+
 class TestStatsEndpoint:
     """Test statistics endpoint"""
     
@@ -201,6 +293,238 @@ class TestStatsEndpoint:
         
         assert data['total_users'] == 2  # From sample_users
 
+    def test_stats_counts_seeded_api_calls(self, client, make_api_calls):
+        """Test stats count bulk-seeded API calls per endpoint"""
+        make_api_calls(50, endpoint='/health')
+        make_api_calls(20, endpoint='/api/data')
+
+        data = json.loads(client.get('/api/stats').data)
+        assert data['health_checks'] == 50
+        assert data['data_requests'] == 20
+
+    def test_stats_report_uptime_from_registry(self, client, make_api_calls, app_config):
+        """Test uptime comes from process start, not the oldest API call"""
+        make_api_calls(5, endpoint='/health', start=datetime(2020, 1, 1))
+
+        data = json.loads(client.get('/api/stats').data)
+        assert data['instance']['pid'] == os.getpid()
+        assert data['instance']['version'] == app_config.VERSION
+        assert data['fleet']['uptime_seconds'] < 24 * 3600
+        assert data['fleet']['worker_restarts'] >= 0
+        assert data['uptime'] == format_uptime(data['fleet']['uptime_seconds'])
+
+    def test_stats_report_dropped_log_records(self, client):
+        """Test the log drop counter is exposed"""
+        data = json.loads(client.get('/api/stats').data)
+        assert data['logging']['dropped_records'] >= 0
+
+class TestResponseCompression:
+    """Test negotiated response compression and the ETag body cache"""
+
+    def test_large_payload_is_gzipped(self, client, make_users):
+        """Test bodies over the threshold are compressed when gzip is accepted"""
+        make_users(50)
+        response = client.get('/api/users', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+        data = json.loads(gzip.decompress(response.data))
+        assert data['count'] == 50
+
+    def test_identity_without_accept_encoding(self, client, make_users):
+        """Test clients that do not ask for compression get plain JSON"""
+        make_users(50)
+        response = client.get('/api/users')
+        assert 'Content-Encoding' not in response.headers
+        assert json.loads(response.data)['count'] == 50
+
+    def test_small_payload_is_not_compressed(self, client):
+        """Test bodies under the threshold are sent as-is"""
+        response = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert json.loads(response.data)['status'] == 'healthy'
+
+    def test_unchanged_users_are_served_from_cache(self, client, make_users):
+        """Test repeated requests reuse the body until users change"""
+        make_users(50)
+        headers = {'Accept-Encoding': 'gzip'}
+        first = client.get('/api/users', headers=headers)
+        second = client.get('/api/users', headers=headers)
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert (json.loads(gzip.decompress(second.data))['users']
+                == json.loads(gzip.decompress(first.data))['users'])
+
+        client.post('/api/users', data=json.dumps({'name': 'New', 'email': 'new@example.com'}),
+                    content_type='application/json')
+        third = client.get('/api/users', headers=headers)
+        assert third.headers['ETag'] != first.headers['ETag']
+        assert json.loads(gzip.decompress(third.data))['count'] == 51
+
+    def test_late_commit_with_older_updated_at_changes_etag(self, client, make_users, db_session):
+        """Test a change stamped before the newest updated_at still refreshes the ETag"""
+        rows = make_users(50)
+        first = client.get('/api/users')
+
+        db_session.execute(
+            update(User)
+            .where(User.id == rows[0]['id'])
+            .values(name='Renamed', updated_at=datetime.utcnow() - timedelta(minutes=5))
+        )
+        db_session.commit()
+
+        second = client.get('/api/users')
+        assert second.headers['ETag'] != first.headers['ETag']
+        assert 'Renamed' in [user['name'] for user in json.loads(second.data)['users']]
+
+    def test_encodings_get_distinct_etags(self, client, make_users):
+        """Test the identity and gzip bodies of one collection do not share an ETag"""
+        make_users(50)
+        identity = client.get('/api/users')
+        gzipped = client.get('/api/users', headers={'Accept-Encoding': 'gzip'})
+        assert gzipped.headers['ETag'] == identity.headers['ETag'][:-1] + '-gzip"'
+
+    def test_cached_users_carry_a_fresh_timestamp(self, client, make_users):
+        """Test users served from the cache still get a per-request timestamp"""
+        make_users(50)
+        first = json.loads(client.get('/api/users').data)
+        time.sleep(0.01)
+        second = json.loads(client.get('/api/users').data)
+        assert second['timestamp'] > first['timestamp']
+        assert second['users'] == first['users']
+        assert second['count'] == 50
+
+    def test_unchanged_users_answer_304(self, client, make_users):
+        """Test If-None-Match with the current ETag gets an empty 304"""
+        make_users(50)
+        for headers in ({}, {'Accept-Encoding': 'gzip'}):
+            etag = client.get('/api/users', headers=headers).headers['ETag']
+            response = client.get('/api/users', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.headers['ETag'] == etag
+            assert response.data == b''
+
+        client.post('/api/users', data=json.dumps({'name': 'New', 'email': 'new@example.com'}),
+                    content_type='application/json')
+        response = client.get('/api/users', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert json.loads(gzip.decompress(response.data) if response.headers.get('Content-Encoding')
+                          else response.data)['count'] == 51
+
+    def test_stats_report_compression(self, client, make_users):
+        """Test compression ratio, CPU time and cache counters are reported"""
+        make_users(50)
+        client.get('/api/users', headers={'Accept-Encoding': 'gzip'})
+
+        compression = json.loads(client.get('/api/stats').data)['compression']
+        assert compression['responses'] >= 1
+        assert compression['ratio'] > 1
+        assert compression['cpu_ms'] >= 0
+        assert compression['cache']['entries'] >= 1
+
+class TestCompressionHelpers:
+    """Test encoding negotiation and streaming compression"""
+
+    def test_negotiate_honours_q_values(self):
+        """Test the highest weighted supported encoding wins"""
+        assert negotiate('gzip', ('br', 'gzip')) == 'gzip'
+        assert negotiate('gzip;q=0.5, br', ('br', 'gzip')) == 'br'
+        assert negotiate('br, gzip', ('br', 'gzip')) == 'br'
+        assert negotiate('*', ('gzip',)) == 'gzip'
+        assert negotiate('gzip;q=0, *;q=0', ('gzip',)) is None
+        assert negotiate('deflate', ('gzip',)) is None
+        assert negotiate(None, ('gzip',)) is None
+
+    def test_stream_compresses_chunks(self):
+        """Test chunked bodies round-trip and are counted as streamed"""
+        compressor = ResponseCompressor()
+        chunks = [b'{"row": %d}\n' % i for i in range(1000)]
+        body = b''.join(compressor.stream(iter(chunks), 'gzip'))
+
+        assert gzip.decompress(body) == b''.join(chunks)
+        stats = compressor.stats()
+        assert stats['streamed_responses'] == 1
+        assert stats['ratio'] > 1
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test the body cache keeps only the most recently used entries"""
+        compressor = ResponseCompressor(cache_size=2)
+        compressor.store_body('a', b'A')
+        compressor.store_body('b', b'B')
+        compressor.cached_body('a')
+        compressor.store_body('c', b'C')
+
+        assert compressor.cached_body('a') == b'A'
+        assert compressor.cached_body('b') is None
+        assert compressor.cached_body('c') == b'C'
+
+class TestInstanceRegistry:
+    """Test the in-memory instance registry"""
+
+    def test_workers_register_and_restarts_are_counted(self):
+        """Test worker slots, restart counts and last recycle time"""
+        registry = InstanceRegistry(slots=4)
+        registry.register(pid=101, started_at=1000.0)
+        registry.register(pid=102, started_at=1001.0)
+
+        fleet = registry.snapshot()['fleet']
+        assert [worker['pid'] for worker in fleet['workers']] == [101, 102]
+        assert fleet['worker_restarts'] == 0
+        assert fleet['last_recycle_at'] is None
+
+        registry.unregister(101)
+        registry.register(pid=103)
+
+        fleet = registry.snapshot()['fleet']
+        assert [worker['pid'] for worker in fleet['workers']] == [102, 103]
+        assert fleet['worker_restarts'] == 1
+        assert fleet['last_recycle_at'] is not None
+
+    def test_full_registry_reuses_oldest_slot(self):
+        """Test a full registry evicts the longest-running entry"""
+        registry = InstanceRegistry(slots=2)
+        registry.register(pid=101, started_at=1000.0)
+        registry.register(pid=102, started_at=2000.0)
+        registry.register(pid=103, started_at=3000.0)
+
+        pids = [worker['pid'] for worker in registry.snapshot()['fleet']['workers']]
+        assert pids == [102, 103]
+
+    def test_instance_falls_back_to_service_boot(self):
+        """Test an unforked process reports the service boot time"""
+        snapshot = InstanceRegistry(slots=2).snapshot(version='2.0.0', host='api-1')
+        assert snapshot['instance']['pid'] == os.getpid()
+        assert snapshot['instance']['host'] == 'api-1'
+        assert snapshot['instance']['started_at'] == snapshot['fleet']['started_at']
+
+    def test_lock_held_by_killed_worker_fails_open(self, monkeypatch):
+        """Test register and snapshot do not hang on a lock a dead worker held"""
+        monkeypatch.setattr('src.instances.LOCK_TIMEOUT', 0.01)
+        registry = InstanceRegistry(slots=2)
+        TestAdmissionControl.run_and_kill_child(registry._lock.acquire)
+
+        registry.register(pid=101, started_at=1000.0)
+        pids = [worker['pid'] for worker in registry.snapshot()['fleet']['workers']]
+        assert pids == [101]
+
+    def test_lock_of_killed_worker_is_released_on_exit(self):
+        """Test child_exit frees the lock so later callers do not wait out the timeout"""
+        registry = InstanceRegistry(slots=2)
+        pid = TestAdmissionControl.run_and_kill_child(lambda: registry._locked().__enter__())
+        registry.unregister(pid)
+
+        assert registry._lock.acquire(timeout=0.01)
+        registry._lock.release()
+
+    def test_workers_record_version_and_host(self):
+        """Test each worker reports the version and host it registered with"""
+        registry = InstanceRegistry(slots=2, version='2.0.0')
+        registry.register(pid=101, started_at=1000.0, host='api-1')
+        registry.register(pid=102, started_at=1001.0, version='2.1.0', host='api-2')
+
+        workers = registry.snapshot()['fleet']['workers']
+        assert [(w['version'], w['host']) for w in workers] == [('2.0.0', 'api-1'), ('2.1.0', 'api-2')]
+
 class TestDatabaseEndpoint:
     """Test database connectivity endpoint"""
     
@@ -233,6 +557,359 @@ class TestInputValidation:
         
         assert response.status_code == 400
 
+class TestAdmissionControl:
+    """Test token-bucket admission control and load shedding"""
+
+    @pytest.fixture
+    def admission_config(self, app_config):
+        class AdmissionTestConfig(app_config):
+            """Test configuration with tight admission limits"""
+            # Each app gets a private database it can create and drop freely
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+            ADMISSION_CONTROL_ENABLED = True
+            ADMISSION_CLIENT_RATE = 0.001
+            ADMISSION_CLIENT_BURST = 2
+            ADMISSION_GLOBAL_RATE = 0.001
+            ADMISSION_GLOBAL_BURST = 3
+            # The test client connects from 127.0.0.1, standing in for nginx
+            ADMISSION_TRUSTED_PROXIES = ['127.0.0.1']
+
+        return AdmissionTestConfig
+
+    @pytest.fixture
+    def admission_client(self, admission_config):
+        app = create_app(admission_config)
+        with app.app_context():
+            db.create_all()
+            yield app.test_client()
+            db.session.remove()
+            db.drop_all()
+
+    def test_client_rate_limit_returns_429(self, admission_client):
+        """Test a client over its bucket is shed with Retry-After"""
+        for _ in range(2):
+            assert admission_client.get('/api/data').status_code == 200
+
+        response = admission_client.get('/api/data')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert json.loads(response.data)['status'] == 429
+
+    def test_global_rate_limit_returns_503(self, admission_client):
+        """Test the shared bucket sheds load across all clients"""
+        for i in range(3):
+            headers = {'X-Real-IP': f'10.0.0.{i}'}
+            assert admission_client.get('/api/data', headers=headers).status_code == 200
+
+        response = admission_client.get('/api/data', headers={'X-Real-IP': '10.0.0.9'})
+        assert response.status_code == 503
+        assert 'Retry-After' in response.headers
+
+    def test_health_is_never_shed(self, admission_client):
+        """Test /health bypasses admission control"""
+        for _ in range(5):
+            admission_client.get('/api/data')
+
+        assert admission_client.get('/health').status_code == 200
+
+    def test_real_ip_is_only_trusted_from_proxies(self):
+        """Test a client reaching the backend directly cannot choose its own key"""
+        trusted = trusted_networks(['172.20.0.10', '10.1.0.0/16'])
+        assert client_address('172.20.0.10', '203.0.113.5', trusted) == '203.0.113.5'
+        assert client_address('10.1.2.3', '203.0.113.5', trusted) == '203.0.113.5'
+        assert client_address('172.20.0.1', '203.0.113.5', trusted) == '172.20.0.1'
+        assert client_address('172.20.0.1', None, trusted) == '172.20.0.1'
+        assert client_address(None, '203.0.113.5', trusted) == 'unknown'
+
+    def test_untrusted_real_ip_shares_the_peer_bucket(self, admission_config):
+        """Test rotating X-Real-IP from an untrusted peer does not reset its bucket"""
+        class DirectConfig(admission_config):
+            ADMISSION_TRUSTED_PROXIES = []
+            ADMISSION_GLOBAL_BURST = 100
+
+        app = create_app(DirectConfig)
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            statuses = [client.get('/api/data', headers={'X-Real-IP': f'10.0.0.{i}'}).status_code
+                        for i in range(3)]
+            db.session.remove()
+            db.drop_all()
+        assert statuses == [200, 200, 429]
+
+    def test_in_flight_limit(self):
+        """Test the concurrency limiter sheds once every slot is taken"""
+        controller = AdmissionController(client_rate=100, client_burst=100,
+                                         global_rate=100, global_burst=100,
+                                         max_in_flight=1)
+        assert controller.admit('10.0.0.1') is None
+        assert controller.admit('10.0.0.2')[0] == 503
+
+        controller.release()
+        assert controller.in_flight() == 0
+        assert controller.admit('10.0.0.2') is None
+
+    @staticmethod
+    def run_and_kill_child(action):
+        """Fork a worker that runs action and is then SIGKILLed, like a timed-out worker"""
+        pid = os.fork()
+        if pid == 0:
+            action()
+            os.kill(os.getpid(), signal.SIGKILL)
+        os.waitpid(pid, 0)
+        return pid
+
+    def test_killed_workers_do_not_leak_in_flight(self):
+        """Test a worker killed mid-request gives back its in-flight count"""
+        controller = AdmissionController(client_rate=100, client_burst=100,
+                                         global_rate=100, global_burst=100,
+                                         max_in_flight=1)
+        pid = self.run_and_kill_child(lambda: controller.admit('10.0.0.1'))
+        assert controller.in_flight() == 1
+        assert controller.admit('10.0.0.2')[0] == 503
+
+        controller.worker_exited(pid)
+        assert controller.in_flight() == 0
+        assert controller.admit('10.0.0.2') is None
+
+    def test_dead_worker_slots_are_reclaimed(self):
+        """Test a new worker reuses a dead worker's slot without inheriting its count"""
+        controller = AdmissionController(client_rate=100, client_burst=100,
+                                         global_rate=100, global_burst=100,
+                                         max_in_flight=5, worker_slots=1)
+        self.run_and_kill_child(lambda: controller.admit('10.0.0.1'))
+        assert controller.in_flight() == 1
+
+        assert controller.admit('10.0.0.2') is None
+        assert controller.in_flight() == 1
+
+    def test_lock_held_by_killed_worker_fails_open(self):
+        """Test a lock orphaned by a killed worker neither hangs nor sheds requests"""
+        controller = AdmissionController(client_rate=100, client_burst=100,
+                                         global_rate=100, global_burst=100,
+                                         max_in_flight=1)
+        pid = self.run_and_kill_child(controller._acquire)
+
+        started = time.monotonic()
+        assert controller.admit('10.0.0.1') is None
+        assert time.monotonic() - started < 1
+
+        controller.release()
+        controller.worker_exited(pid)
+        assert controller.admit('10.0.0.1') is None
+        assert controller.admit('10.0.0.2')[0] == 503
+
+class TestStructuredLogging:
+    """Test queued JSON logging"""
+
+    def test_request_id_is_generated(self, client):
+        """Test every response carries a request ID"""
+        response = client.get('/api/data')
+        assert response.headers['X-Request-ID']
+
+    def test_request_id_is_propagated(self, client):
+        """Test an incoming request ID is reused"""
+        response = client.get('/api/data', headers={'X-Request-ID': 'abc123'})
+        assert response.headers['X-Request-ID'] == 'abc123'
+
+    def test_json_formatter_renders_extra_fields(self):
+        """Test records become one JSON object with extra fields"""
+        record = logging.makeLogRecord({
+            'name': 'src.requests', 'levelno': logging.INFO, 'levelname': 'INFO',
+            'msg': '%s %s', 'args': ('GET', '/health'),
+            'request_id': 'abc123', 'duration_ms': 1.5,
+        })
+        entry = json.loads(JSONFormatter().format(record))
+        assert entry['message'] == 'GET /health'
+        assert entry['request_id'] == 'abc123'
+        assert entry['duration_ms'] == 1.5
+
+    def test_full_queue_drops_and_counts(self):
+        """Test a full queue drops records instead of blocking"""
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for i in range(3):
+            handler.handle(logging.makeLogRecord({'msg': f'record {i}'}))
+        assert handler.dropped == 2
+
+    def test_drop_count_is_exact_across_threads(self):
+        """Test concurrent enqueues on a full queue count every drop"""
+        handler = DroppingQueueHandler(queue.Queue(1))
+        handler.enqueue(logging.makeLogRecord({'msg': 'fills the queue'}))
+
+        def flood():
+            for i in range(2000):
+                handler.enqueue(logging.makeLogRecord({'msg': f'record {i}'}))
+
+        threads = [threading.Thread(target=flood) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert handler.dropped == 8000
+
+    def test_sampling_keeps_warnings(self):
+        """Test sampled loggers still pass warnings and errors"""
+        sampler = SamplingFilter({'noisy': 0.0})
+        assert not sampler.filter(logging.makeLogRecord({'name': 'noisy.child', 'levelno': logging.INFO}))
+        assert sampler.filter(logging.makeLogRecord({'name': 'noisy', 'levelno': logging.WARNING}))
+        assert sampler.filter(logging.makeLogRecord({'name': 'quiet', 'levelno': logging.INFO}))
+
+class TestAPICallPartitions:
+    """Test api_calls partition helpers"""
+
+    def test_add_months_crosses_years(self):
+        """Test month arithmetic wraps around year boundaries"""
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    def test_retention_start_keeps_whole_months(self):
+        """Test the retention window starts on a month boundary"""
+        assert retention_start(3, today=date(2025, 5, 17)) == datetime(2025, 2, 1)
+
+    def test_maintenance_is_noop_without_partitioning(self, app):
+        """Test SQLite keeps the plain api_calls table"""
+        with app.app_context():
+            conn = db.session.connection()
+            assert not is_partitioned(conn)
+            maintain_api_call_partitions(conn)
+
+    def test_maintenance_runs_at_startup(self, monkeypatch, app_config):
+        """Test constructing the app maintains partitions"""
+        class StartupConfig(app_config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+            AUTO_CREATE_SCHEMA = True
+
+        calls = []
+        monkeypatch.setattr('src.app.maintain_api_call_partitions',
+                            lambda conn, **options: calls.append(options))
+        create_app(StartupConfig)
+        assert calls == [{'months_ahead': 3, 'retain_months': 3, 'drop': True}]
+
+    class RecordingConnection:
+        """Stand-in for a Postgres connection that records the SQL it is sent"""
+
+        def __init__(self, partitions=(), stranded=(), tables=()):
+            self.partitions = partitions
+            self.stranded = stranded
+            self.tables = tables
+            self.statements = []
+
+        def execute(self, statement, params=None):
+            sql = str(statement)
+            self.statements.append(sql)
+            if 'pg_inherits' in sql:
+                return iter([(name, ) for name in self.partitions])
+            if sql.startswith('SELECT DISTINCT'):
+                return iter([(month, ) for month in self.stranded])
+            exists = params is not None and params['name'] in self.tables
+            return type('Result', (), {'rowcount': 2, 'scalar': lambda self: 1 if exists else None})()
+
+    def test_stranded_default_rows_are_moved_before_attaching(self):
+        """Test months stuck in the default partition get a partition of their own"""
+        conn = self.RecordingConnection(['api_calls_p2025_06'], [date(2025, 5, 1)])
+        created = create_partitions(conn, 1, today=date(2025, 5, 17))
+        assert created == ['api_calls_p2025_05']
+
+        statements = conn.statements[2:]
+        assert statements[0].startswith('CREATE TABLE api_calls_p2025_05 (LIKE api_calls')
+        assert 'DELETE FROM api_calls_default' in statements[1]
+        assert statements[2].startswith('ALTER TABLE api_calls ATTACH PARTITION api_calls_p2025_05')
+
+    def test_stranded_rows_past_retention_get_no_partition(self):
+        """Test a late row for an expired month never recreates its partition"""
+        conn = self.RecordingConnection(['api_calls_p2025_05'], [date(2025, 1, 1)])
+        created = create_partitions(conn, 0, today=date(2025, 5, 17), retain_from=date(2025, 2, 1))
+        assert created == []
+
+        expired = expire_partitions(conn, 3, drop=False, today=date(2025, 5, 17))
+        assert expired == ['api_calls_default (2025-01)']
+        assert any('INSERT INTO api_calls_archived_2025_01' in sql for sql in conn.statements)
+
+    def test_detached_partitions_are_renamed(self):
+        """Test detach mode frees the partition name, merging into an existing archive"""
+        conn = self.RecordingConnection(['api_calls_p2025_01', 'api_calls_p2025_02'],
+                                        tables=['api_calls_archived_2025_02'])
+        expire_partitions(conn, 2, drop=False, today=date(2025, 5, 17))
+        assert 'ALTER TABLE api_calls_p2025_01 RENAME TO api_calls_archived_2025_01' in conn.statements
+        assert 'INSERT INTO api_calls_archived_2025_02 SELECT * FROM api_calls_p2025_02' in conn.statements
+        assert 'DROP TABLE api_calls_p2025_02' in conn.statements
+
+    def test_maintenance_timer_repeats_until_stopped(self, monkeypatch):
+        """Test the master's timer keeps maintaining partitions"""
+        calls = []
+        monkeypatch.setattr('src.partitions.maintain_database',
+                            lambda uri, **options: calls.append(uri))
+        stopped = start_maintenance_timer({'API_CALLS_MAINTENANCE_INTERVAL_SECONDS': 0.01,
+                                           'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        deadline = time.monotonic() + 5
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stopped.set()
+        assert calls[:2] == ['sqlite://', 'sqlite://']
+
+    def test_maintenance_timer_can_be_disabled(self):
+        """Test a zero interval starts no timer"""
+        assert start_maintenance_timer({'API_CALLS_MAINTENANCE_INTERVAL_SECONDS': 0}) is None
+
+    def test_stats_ignore_calls_before_retention_window(self, app, client):
+        """Test stats only count calls inside the retention window"""
+        with app.app_context():
+            db.session.add(APICall(endpoint='/health', method='GET',
+                                   timestamp=datetime(2000, 1, 1)))
+            db.session.commit()
+
+        data = json.loads(client.get('/api/stats').data)
+        assert data['health_checks'] == 0
+
+class TestGunicornConfig:
+    """Test gunicorn runtime profiles"""
+
+    CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+    @pytest.fixture(autouse=True)
+    def isolated_environ(self, monkeypatch):
+        """gunicorn.conf.py exports pool sizes; keep them out of other tests"""
+        monkeypatch.setattr(os, 'environ', dict(os.environ))
+
+    def test_profiles_are_sized_from_available_cpus(self, monkeypatch):
+        """Test each profile picks its worker class, app and CPU-derived sizing"""
+        monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+        monkeypatch.setenv('GUNICORN_PROFILE', 'gthread')
+        config = runpy.run_path(self.CONFIG)
+        assert config['worker_class'] == 'gthread'
+        assert config['wsgi_app'] == 'src.app:app'
+        assert config['workers'] == config['CPUS'] + 1
+        assert config['max_requests_jitter'] > 0
+        assert callable(config['when_ready'])
+
+        monkeypatch.setenv('GUNICORN_PROFILE', 'uvicorn')
+        monkeypatch.setenv('GUNICORN_WORKERS', '3')
+        config = runpy.run_path(self.CONFIG)
+        assert config['wsgi_app'] == 'src.asgi:app'
+        assert config['workers'] == 3
+
+    def test_workers_share_the_database_connection_budget(self, monkeypatch):
+        """Test worker pools together never exceed DB_MAX_CONNECTIONS"""
+        monkeypatch.setenv('GUNICORN_PROFILE', 'sync')
+        monkeypatch.setenv('GUNICORN_WORKERS', '17')
+        monkeypatch.setenv('DB_MAX_CONNECTIONS', '80')
+        monkeypatch.delenv('DB_POOL_SIZE', raising=False)
+        monkeypatch.delenv('DB_MAX_OVERFLOW', raising=False)
+        config = runpy.run_path(self.CONFIG)
+        assert (config['db_pool_size'], config['db_max_overflow']) == (4, 0)
+        assert os.environ['DB_POOL_SIZE'] == '4'
+
+        monkeypatch.setenv('GUNICORN_WORKERS', '200')
+        config = runpy.run_path(self.CONFIG)
+        assert config['workers'] == 80
+        assert config['workers'] * (config['db_pool_size'] + config['db_max_overflow']) <= 80
+
+    def test_unknown_profile_is_rejected(self, monkeypatch):
+        """Test a typo in GUNICORN_PROFILE stops gunicorn from starting"""
+        monkeypatch.setenv('GUNICORN_PROFILE', 'threaded')
+        with pytest.raises(SystemExit):
+            runpy.run_path(self.CONFIG)
+
 class TestErrorHandling:
     """Test error handling"""
     
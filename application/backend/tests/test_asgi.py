@@ -0,0 +1,166 @@
+"""
+Run the backend test suite against the async serving mode (src.asgi)
+Run with: python -m pytest tests/test_asgi.py -v
+"""
+
+import pytest
+import asyncio
+import logging
+import os
+import sys
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, inspect
+
+from src.app import create_app
+from src.asgi import async_database_uri, create_asgi_app
+from src.models import db
+
+# Re-collect the synchronous test classes so every case runs against both modes
+from tests.test_app import (  # noqa: F401
+    TestHealthEndpoints,
+    TestAPIDataEndpoint,
+    TestUsersEndpoints,
+    TestUserChangesEndpoint,
+    TestStatsEndpoint,
+    TestResponseCompression,
+    TestDatabaseEndpoint,
+    TestInputValidation,
+    TestErrorHandling,
+    TestAPICounting,
+)
+
+class ASGIResponse:
+    """Quart response with the attributes the Flask-based tests read"""
+    def __init__(self, status_code, content_type, data, headers):
+        self.status_code = status_code
+        self.content_type = content_type
+        self.data = data
+        self.headers = headers
+
+class SyncASGIClient:
+    """Drive the ASGI app from synchronous tests on a private event loop"""
+    def __init__(self, app):
+        self.loop = asyncio.new_event_loop()
+        self.test_app = app.test_app()
+        self.loop.run_until_complete(self.test_app.startup())
+        self.client = self.test_app.test_client()
+
+    def close(self):
+        self.loop.run_until_complete(self.test_app.shutdown())
+        self.loop.close()
+
+    def open(self, path, method, data=None, content_type=None, headers=None):
+        headers = dict(headers or {})
+        if content_type:
+            headers['Content-Type'] = content_type
+
+        async def request():
+            response = await self.client.open(path, method=method, data=data,
+                                              headers=headers)
+            return ASGIResponse(response.status_code, response.content_type,
+                                await response.get_data(), response.headers)
+
+        return self.loop.run_until_complete(request())
+
+    def get(self, path, **kwargs):
+        return self.open(path, 'GET', **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.open(path, 'POST', **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.open(path, 'PATCH', **kwargs)
+
+@pytest.fixture
+def test_config(tmp_path):
+    """File-backed SQLite so the sync fixtures and the async app share data"""
+    class TestConfig:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SECRET_KEY = 'test-secret-key'
+        ENVIRONMENT = 'testing'
+        VERSION = '1.0.0'
+        USER_SYNC_SAFETY_LAG_SECONDS = 0
+
+    return TestConfig
+
+@pytest.fixture
+def app(test_config):
+    """Create the synchronous app used by data fixtures"""
+    app = create_app(test_config)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def db_session(app):
+    """Commit for real - the ASGI app reads through its own connections"""
+    return db.session
+
+@pytest.fixture
+def client(app, test_config):
+    """Test client for the async serving mode"""
+    client = SyncASGIClient(create_asgi_app(test_config))
+    yield client
+    client.close()
+
+def test_async_database_uri():
+    """Test sync database URIs are mapped onto async drivers"""
+    assert async_database_uri('postgresql://u:p@db:5432/x').drivername == 'postgresql+asyncpg'
+    assert async_database_uri('sqlite:///:memory:').drivername == 'sqlite+aiosqlite'
+
+def test_schema_is_created_when_the_app_is_built(test_config):
+    """Test tables exist before any worker starts serving"""
+    create_asgi_app(test_config)
+    engine = create_engine(test_config.SQLALCHEMY_DATABASE_URI)
+    try:
+        assert {'users', 'user_tombstones', 'api_calls'} <= set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+
+def test_partitions_are_maintained_once_not_per_worker(test_config, monkeypatch):
+    """Test partition DDL runs when the app is built, not when each worker starts serving"""
+    calls = []
+    monkeypatch.setattr('src.asgi.maintain_database', lambda uri, **options: calls.append(options))
+    client = SyncASGIClient(create_asgi_app(test_config))
+    client.get('/health')
+    client.close()
+    assert calls == [{'months_ahead': 3, 'retain_months': 3, 'drop': True}]
+
+def test_request_ids_and_timing_are_logged(client, caplog):
+    """Test the async mode tags responses and logs one timed line per request"""
+    with caplog.at_level(logging.INFO, logger='src.requests'):
+        response = client.get('/api/data', headers={'X-Request-ID': 'abc123'})
+
+    assert response.headers['X-Request-ID'] == 'abc123'
+    record = next(r for r in caplog.records if r.name == 'src.requests')
+    assert (record.path, record.status) == ('/api/data', 200)
+    assert record.duration_ms >= 0
+
+def test_admission_control_sheds_load(app, test_config):
+    """Test the async mode enforces the same limits as the sync one"""
+    class AdmissionConfig(test_config):
+        ADMISSION_CONTROL_ENABLED = True
+        ADMISSION_CLIENT_RATE = 0.001
+        ADMISSION_CLIENT_BURST = 2
+
+    client = SyncASGIClient(create_asgi_app(AdmissionConfig))
+    try:
+        for _ in range(2):
+            assert client.get('/api/data').status_code == 200
+        response = client.get('/api/data')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert client.get('/health').status_code == 200
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    pytest.main(['-v'])
@@ -22,14 +22,54 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Tombstones for deleted users, written by a trigger on users so that
+-- delta sync clients (/api/users/changes) can drop cached rows
+CREATE TABLE IF NOT EXISTS user_tombstones (
+    user_id UUID PRIMARY KEY,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Version token per collection, bumped by a trigger on every write so that
+-- response ETags change when the write commits
+CREATE SEQUENCE IF NOT EXISTS collection_version_seq;
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+-- api_calls is range partitioned by month on timestamp so inserts only touch
+-- the small current partition and retention drops whole partitions. The
+-- backend creates upcoming partitions and expires old ones at startup and on
+-- a timer in the gunicorn master (flask maintain-partitions runs it by hand).
+-- Existing databases are converted by migrations/001-partition-api-calls.sql.
 CREATE TABLE IF NOT EXISTS api_calls (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     endpoint VARCHAR(255) NOT NULL,
     method VARCHAR(10) NOT NULL,
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     user_agent TEXT,
-    ip_address INET
-);
+    ip_address INET,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catches rows outside every monthly partition instead of rejecting them
+CREATE TABLE IF NOT EXISTS api_calls_default PARTITION OF api_calls DEFAULT;
+
+-- Partitions for the current month and the next three
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..3 LOOP
+        month_start := date_trunc('month', NOW()) + make_interval(months => i);
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF api_calls FOR VALUES FROM (%L) TO (%L)',
+            'api_calls_p' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END $$;
 
 CREATE TABLE IF NOT EXISTS health_checks (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -42,10 +82,13 @@ CREATE TABLE IF NOT EXISTS health_checks (
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_users_updated_at_id ON users(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_user_tombstones_deleted_at_user_id ON user_tombstones(deleted_at, user_id);
 
+-- Partitioned indexes: each partition gets its own small B-tree. No method
+-- index - nothing filters on it and it would be one more tree per insert.
 CREATE INDEX IF NOT EXISTS idx_api_calls_endpoint ON api_calls(endpoint);
 CREATE INDEX IF NOT EXISTS idx_api_calls_timestamp ON api_calls(timestamp);
-CREATE INDEX IF NOT EXISTS idx_api_calls_method ON api_calls(method);
 
 CREATE INDEX IF NOT EXISTS idx_health_checks_timestamp ON health_checks(timestamp);
 CREATE INDEX IF NOT EXISTS idx_health_checks_status ON health_checks(status);
@@ -64,6 +107,41 @@ CREATE TRIGGER update_users_updated_at
     FOR EACH ROW 
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Record a tombstone for every deleted user, however the delete is issued
+CREATE OR REPLACE FUNCTION record_user_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_tombstones (user_id, deleted_at)
+    VALUES (OLD.id, NOW())
+    ON CONFLICT (user_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER record_users_tombstone
+    AFTER DELETE ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION record_user_tombstone();
+
+-- Bump the users version on every write. updated_at is stamped when the
+-- transaction starts, so a slow transaction can commit a change older than
+-- one already served; the version row is written inside the transaction and
+-- becomes visible when it commits. Writers serialize on the row lock.
+CREATE OR REPLACE FUNCTION bump_users_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO collection_versions (name, version)
+    VALUES ('users', nextval('collection_version_seq'))
+    ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER bump_users_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_users_version();
+
 -- Insert initial sample data
 INSERT INTO users (name, email) 
 VALUES 
@@ -73,4 +151,4 @@ ON CONFLICT (email) DO NOTHING;
 
 -- Log initialization completion
 INSERT INTO health_checks (status, details) 
-VALUES ('healthy', '{"message": "Database initialized successfully", "tables_created": ["users", "api_calls", "health_checks"]}');
+VALUES ('healthy', '{"message": "Database initialized successfully", "tables_created": ["users", "user_tombstones", "api_calls", "health_checks"]}');
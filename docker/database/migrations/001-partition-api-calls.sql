@@ -0,0 +1,78 @@
+-- Convert an existing plain api_calls table to the monthly partitioned layout
+-- that init/01-init.sql creates for new databases. init scripts only run on an
+-- empty data volume, so databases created before partitioning need this once:
+--
+--   docker-compose exec -T database psql -U admin -d infraprime \
+--     < docker/database/migrations/001-partition-api-calls.sql
+--
+-- Until it runs, the backend's partition maintenance is a no-op and api_calls
+-- keeps growing. The table is locked for the copy; run it in a quiet window.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'api_calls'
+    ) THEN
+        RAISE EXCEPTION 'api_calls is already partitioned';
+    END IF;
+END $$;
+
+LOCK TABLE api_calls IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE api_calls RENAME TO api_calls_unpartitioned;
+ALTER INDEX IF EXISTS idx_api_calls_endpoint RENAME TO idx_api_calls_unpartitioned_endpoint;
+ALTER INDEX IF EXISTS idx_api_calls_timestamp RENAME TO idx_api_calls_unpartitioned_timestamp;
+ALTER INDEX IF EXISTS idx_api_calls_method RENAME TO idx_api_calls_unpartitioned_method;
+
+CREATE TABLE api_calls (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    endpoint VARCHAR(255) NOT NULL,
+    method VARCHAR(10) NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    user_agent TEXT,
+    ip_address INET,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE api_calls_default PARTITION OF api_calls DEFAULT;
+
+-- A partition for every month with rows, through three months from now, so
+-- nothing is left in the default partition
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            LEAST(
+                date_trunc('month', NOW()),
+                COALESCE(date_trunc('month', MIN(timestamp)), date_trunc('month', NOW()))
+            ),
+            date_trunc('month', NOW()) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::DATE
+        FROM api_calls_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF api_calls FOR VALUES FROM (%L) TO (%L)',
+            'api_calls_p' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END $$;
+
+-- Rows without a timestamp are dated to the migration
+INSERT INTO api_calls (id, endpoint, method, timestamp, user_agent, ip_address)
+SELECT id, endpoint, method, COALESCE(timestamp, NOW()), user_agent, ip_address
+FROM api_calls_unpartitioned;
+
+CREATE INDEX idx_api_calls_endpoint ON api_calls(endpoint);
+CREATE INDEX idx_api_calls_timestamp ON api_calls(timestamp);
+
+DROP TABLE api_calls_unpartitioned;
+
+COMMIT;
@@ -0,0 +1,39 @@
+-- Install the delta sync schema (/api/users/changes) on databases created
+-- before it existed. init/01-init.sql only runs on an empty data volume, and
+-- the backend's create_all adds user_tombstones but skips the trigger because
+-- users already exists, so deletes would go unrecorded without this:
+--
+--   docker-compose exec -T database psql -U admin -d infraprime \
+--     < docker/database/migrations/002-user-tombstones.sql
+--
+-- Safe to run more than once.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS user_tombstones (
+    user_id UUID PRIMARY KEY,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Keyset paging over (updated_at, id) and (deleted_at, user_id)
+CREATE INDEX IF NOT EXISTS idx_users_updated_at_id ON users(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_user_tombstones_deleted_at_user_id ON user_tombstones(deleted_at, user_id);
+
+-- Record a tombstone for every deleted user, however the delete is issued
+CREATE OR REPLACE FUNCTION record_user_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_tombstones (user_id, deleted_at)
+    VALUES (OLD.id, NOW())
+    ON CONFLICT (user_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS record_users_tombstone ON users;
+CREATE TRIGGER record_users_tombstone
+    AFTER DELETE ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION record_user_tombstone();
+
+COMMIT;
@@ -0,0 +1,42 @@
+-- Install the users version token behind the GET /api/users ETag on databases
+-- created before it existed. The backend's create_all adds the table but skips
+-- the trigger because users already exists, so without this the ETag is never
+-- set and every request serializes the list again:
+--
+--   docker-compose exec -T database psql -U admin -d infraprime \
+--     < docker/database/migrations/003-users-version.sql
+--
+-- Safe to run more than once.
+
+BEGIN;
+
+CREATE SEQUENCE IF NOT EXISTS collection_version_seq;
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+-- Bump the users version on every write; it becomes visible when the write
+-- commits, unlike updated_at which is stamped when the transaction starts
+CREATE OR REPLACE FUNCTION bump_users_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO collection_versions (name, version)
+    VALUES ('users', nextval('collection_version_seq'))
+    ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bump_users_version ON users;
+CREATE TRIGGER bump_users_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_users_version();
+
+-- Start from a fresh token so no pre-migration ETag is reused
+INSERT INTO collection_versions (name, version)
+VALUES ('users', nextval('collection_version_seq'))
+ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version;
+
+COMMIT;